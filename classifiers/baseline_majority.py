@@ -1,8 +1,10 @@
 from collections import Counter
 from typing import List
 
+from classifiers.batching import ChunkedPredictor
 
-class BaselineMajority:
+
+class BaselineMajority(ChunkedPredictor):
     def __init__(self, acts: List[str]):
         counts = Counter(acts)
         counts = sorted(counts.items(), key=lambda item: item[1], reverse=True)
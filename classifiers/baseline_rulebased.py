@@ -1,6 +1,8 @@
 import re
 from collections import Counter
-from typing import List
+from typing import List, Optional
+
+from classifiers.batching import ChunkedPredictor
 
 
 RULES_MORE = [  # 93.1%
@@ -54,7 +56,7 @@ RULES_LESS = [  # ~80%
 ]
 
 
-class BaselineRuleBased:
+class BaselineRuleBased(ChunkedPredictor):
     def __init__(self, acts: List[str]):
         counts = Counter(acts)
         counts = sorted(counts.items(), key=lambda item: item[1], reverse=True)
@@ -65,16 +67,24 @@ class BaselineRuleBased:
         # Still use majority act for when no rules match.
         self.majority_act = majority_act
         self.rules = RULES_MORE
+        self.compiled_rules = [(re.compile(rule), label) for rule, label in self.rules]
         self.info = f"{len(self.rules)} rules"
 
+    def match(self, sentence: str) -> Optional[int]:
+        # Index of the first rule that matches, or None if we'd fall back on the majority act.
+        for i, (rule, _) in enumerate(self.compiled_rules):
+            if rule.search(sentence):
+                return i
+
+        return None
+
     def predict(self, sentences: List[str]) -> List[str]:
         labels = []
         for sentence in sentences:
-            for rule, label in self.rules:
-                if re.search(rule, sentence):
-                    labels.append(label)
-                    break
-            else:
+            rule_index = self.match(sentence)
+            if rule_index is None:
                 labels.append(self.majority_act)
+            else:
+                labels.append(self.compiled_rules[rule_index][1])
 
         return labels
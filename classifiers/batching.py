@@ -0,0 +1,24 @@
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+CHUNK_SIZE = 1024
+
+
+def chunked(items: Iterable, size: int = CHUNK_SIZE) -> Iterator[List]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def predict_in_chunks(predict: Callable[[List[str]], Iterable[str]], sentences: Iterable[str],
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    # Streams predictions for any number of sentences while holding at most one chunk (and its features) in memory.
+    for chunk in chunked(sentences, chunk_size):
+        yield from predict(chunk)
+
+
+class ChunkedPredictor:
+    # Mixin for classifiers with a batch predict(sentences): adds predict_iter, which streams any number of sentences
+    # through predict one chunk at a time.
+    def predict_iter(self, sentences: Iterable[str], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        return predict_in_chunks(self.predict, sentences, chunk_size)
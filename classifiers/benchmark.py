@@ -0,0 +1,113 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from classifiers.registry import CLASSIFIERS, import_classifier_module, load_classifier
+from data.data_processor import iter_labelled_lines
+from data.synthetic import synthetic_acts
+
+# Training time, peak memory and predict throughput of each classifier over synthetic corpora of growing size. Every
+# measurement runs in its own child process, so classifiers don't share imports or memory, and peak memory is the
+# growth of the child's maximum resident set size during training (which includes TensorFlow's native memory).
+
+DEFAULT_SIZES = [10000, 25000, 50000, 100000, 200000]
+TEST_SIZE = 10000  # Same number of sentences to predict at every corpus size
+MIB = 1024 * 1024
+
+
+def _max_rss() -> int:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def benchmark_classifier(name: str, train_data, test_data) -> dict:
+    # Imported first, so importing e.g. TensorFlow is neither training time nor training memory
+    start = time.perf_counter()
+    import_classifier_module(CLASSIFIERS[name][0])
+    import_seconds = time.perf_counter() - start
+
+    start_rss = _max_rss()
+    start = time.perf_counter()
+    model = load_classifier(name, train_data)
+    train_seconds = time.perf_counter() - start
+    peak = _max_rss() - start_rss
+
+    sentences = [utterance for _, utterance in test_data]
+    start = time.perf_counter()
+    predictions = list(model.predict_iter(sentences))
+    predict_seconds = time.perf_counter() - start
+
+    correct = sum(prediction == act for prediction, (act, _) in zip(predictions, test_data))
+    return {
+        "classifier": name,
+        "train_size": len(train_data),
+        "import_s": round(import_seconds, 3),
+        "train_s": round(train_seconds, 3),
+        "train_peak_mib": round(peak / MIB, 2),
+        "predict_per_s": round(len(sentences) / predict_seconds),
+        "accuracy": round(correct / len(test_data), 4),
+    }
+
+
+def _benchmark_in_child(conn, name: str, train_data, test_data) -> None:
+    conn.send(benchmark_classifier(name, train_data, test_data))
+    conn.close()
+
+
+def benchmark_in_process(context, name: str, train_data, test_data) -> dict:
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_benchmark_in_child, args=(child_conn, name, train_data, test_data))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        raise RuntimeError(f"Benchmarking {name} failed") from None
+    finally:
+        process.join()
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark classifiers on synthetic corpora of growing size.")
+    parser.add_argument("--classifiers", nargs="+", choices=list(CLASSIFIERS), default=list(CLASSIFIERS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as CSV.")
+    args = parser.parse_args()
+
+    # Train and test sentences are generated from disjoint parts of the real data
+    data = list(iter_labelled_lines())
+    random.Random(args.seed).shuffle(data)
+    split = len(data) * 9 // 10
+    test_data = synthetic_acts(data[split:], TEST_SIZE, seed=args.seed)
+
+    # The parent never imports a classifier module, so forking it is safe (also with TensorFlow classifiers).
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    results = []
+    for size in args.sizes:
+        train_data = synthetic_acts(data[:split], size, seed=args.seed)
+        for name in args.classifiers:
+            result = benchmark_in_process(context, name, train_data, test_data)
+            results.append(result)
+            print(f"{name:<20} {size:>8} rows: imported in {result['import_s']:.3f}s, "
+                  f"trained in {result['train_s']:.3f}s, "
+                  f"peak +{result['train_peak_mib']:.2f} MiB, "
+                  f"{result['predict_per_s']} predictions/s, accuracy {result['accuracy']:.2%}")
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
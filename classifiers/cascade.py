@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from classifiers.baseline_rulebased import BaselineRuleBased
+from classifiers.batching import ChunkedPredictor
+from data.static_tables import PackedStrings, with_prefix, strip_prefix
+
+CONFIDENCE_THRESHOLD = 0.9
+
+TIERS = ["exact", "rules", "model"]
+
+
+class PackedExactTable:
+    def __init__(self, sentences: PackedStrings, act_codes: np.ndarray, confidences: np.ndarray, acts: List[str]):
+        # Read-only stand-in for the exact-match dict, backed by (memory-mapped) arrays. A lookup is a binary search
+        # over the sentences (a few microseconds per utterance), traded for not holding a copy in every worker.
+        self.sentences = sentences
+        self.act_codes = act_codes
+        self.confidences = confidences
+        self.acts = acts
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def get(self, sentence: str, default=None):
+        i = self.sentences.index(sentence)
+        if i < 0:
+            return default
+        return self.acts[self.act_codes[i]], float(self.confidences[i])
+
+
+class CascadeClassifier(ChunkedPredictor):
+    def __init__(self, train_data: List[Tuple[str, str]], model=None, threshold: float = CONFIDENCE_THRESHOLD):
+        # Tiers are tried from cheap to expensive: exact training utterances, then the rule baseline, then the
+        # statistical model. A tier answers only if its confidence (measured on train_data) reaches the threshold.
+        self.model = model
+        self.threshold = threshold
+
+        sentence_acts: Dict[str, Counter] = defaultdict(Counter)
+        for act, sentence in train_data:
+            sentence_acts[sentence][act] += 1
+
+        self.exact: Dict[str, Tuple[str, float]] = {}
+        for sentence, acts in sentence_acts.items():
+            act, count = acts.most_common(1)[0]
+            self.exact[sentence] = (act, count / sum(acts.values()))
+
+        self.rule_based = BaselineRuleBased([act for act, _ in train_data])
+
+        rule_hits = Counter()
+        rule_correct = Counter()
+        for act, sentence in train_data:
+            rule_index = self.rule_based.match(sentence)
+            if rule_index is not None:
+                rule_hits[rule_index] += 1
+                rule_correct[rule_index] += act == self.rule_based.compiled_rules[rule_index][1]
+        self.rule_confidence = [rule_correct[i] / rule_hits[i] if rule_hits[i] else 0
+                                for i in range(len(self.rule_based.compiled_rules))]
+
+        self.stats = Counter({tier: 0 for tier in TIERS})
+
+        model_info = type(model).__name__ if model is not None else "no model"
+        self.info = f"threshold: {threshold}, {len(self.exact)} exact utterances, {model_info}"
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        labels = []
+        fallback = []  # Indices of sentences that go to the statistical model
+        for i, sentence in enumerate(sentences):
+            exact_act, exact_confidence = self.exact.get(sentence, (None, 0))
+            if exact_confidence >= self.threshold:
+                labels.append(exact_act)
+                self.stats["exact"] += 1
+                continue
+
+            rule_index = self.rule_based.match(sentence)
+            if rule_index is not None and self.rule_confidence[rule_index] >= self.threshold:
+                labels.append(self.rule_based.compiled_rules[rule_index][1])
+                self.stats["rules"] += 1
+                continue
+
+            if self.model is None:
+                # No model to defer to: use the best guess of the cheap tiers.
+                if exact_act is not None:
+                    labels.append(exact_act)
+                    self.stats["exact"] += 1
+                else:
+                    labels.append(self.rule_based.predict([sentence])[0])
+                    self.stats["rules"] += 1
+                continue
+
+            labels.append(None)
+            fallback.append(i)
+
+        if fallback:
+            # Batch all remaining sentences into a single model call.
+            for i, act in zip(fallback, self.model.predict([sentences[i] for i in fallback])):
+                labels[i] = act
+            self.stats["model"] += len(fallback)
+
+        return labels
+
+    def hit_rates(self) -> Dict[str, float]:
+        total = sum(self.stats.values())
+        return {tier: self.stats[tier] / total if total else 0 for tier in TIERS}
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        # Only possible when the statistical model can be exported too (see classifiers.compiled).
+        sentences = PackedStrings.from_strings(self.exact, sort=True)
+        acts = sorted(set(act for act, _ in self.exact.values()))
+        arrays = {
+            "exact_act_codes": np.array([acts.index(self.exact[s][0]) for s in sentences], dtype=np.int16),
+            "exact_confidences": np.array([self.exact[s][1] for s in sentences], dtype=np.float64),
+            **sentences.to_arrays("exact_sentences")
+        }
+        meta = {"class": type(self).__name__, "acts": acts, "threshold": self.threshold,
+                "majority_act": self.rule_based.majority_act, "rule_confidence": self.rule_confidence}
+
+        if self.model is not None:
+            model_arrays, meta["model"] = self.model.to_arrays()
+            arrays.update(with_prefix(model_arrays, "model_"))
+
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> "CascadeClassifier":
+        from classifiers.registry import classifier_from_arrays
+
+        model = classifier_from_arrays(strip_prefix(arrays, "model_"), meta["model"]) if "model" in meta else None
+
+        cascade = cls.__new__(cls)  # Skip __init__, everything it would compute from the training data is stored
+        cascade.model = model
+        cascade.threshold = meta["threshold"]
+        cascade.stats = Counter({tier: 0 for tier in TIERS})
+        cascade.exact = PackedExactTable(PackedStrings.from_arrays(arrays, "exact_sentences"),
+                                         arrays["exact_act_codes"], arrays["exact_confidences"], meta["acts"])
+        cascade.rule_based = BaselineRuleBased([meta["majority_act"]])
+        cascade.rule_confidence = meta["rule_confidence"]
+        cascade.info = f"threshold: {cascade.threshold}, {len(cascade.exact)} exact utterances, " \
+                       f"{type(model).__name__ if model is not None else 'no model'}"
+
+        return cascade
@@ -0,0 +1,162 @@
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from classifiers.batching import ChunkedPredictor
+from data.static_tables import PackedStrings
+
+
+# Compiled predictors score tokenized input straight from lookup tables, skipping CountVectorizer.transform, sparse
+# matrix construction and sklearn's input validation. They only depend on numpy and give the same predictions as the
+# fitted sklearn objects they were exported from.
+
+
+def _check_vectorizer(vectorizer) -> None:
+    if vectorizer.analyzer != "word" or vectorizer.ngram_range != (1, 1) or vectorizer.stop_words is not None \
+            or vectorizer.preprocessor is not None or vectorizer.tokenizer is not None or vectorizer.strip_accents:
+        raise ValueError("Only default unigram CountVectorizer settings can be compiled")
+
+
+class _Tokenizer:
+    def __init__(self, token_pattern: str, lowercase: bool, vocabulary):
+        self.token_regex = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.vocabulary = vocabulary
+
+    def feature_counts(self, sentence: str) -> Counter:
+        if self.lowercase:
+            sentence = sentence.lower()
+
+        counts = Counter()
+        for token in self.token_regex.findall(sentence):
+            index = self.vocabulary.get(token)
+            if index is not None:
+                counts[index] += 1
+
+        return counts
+
+
+def _vocabulary_from_arrays(arrays: Dict[str, np.ndarray]) -> Dict[str, int]:
+    # The vocabulary is a few thousand tokens at most, so it's copied into a dict: looking up every token with a binary
+    # search over the memory-mapped strings made prediction ~5x slower. Only the weights stay shared.
+    return {token: i for i, token in enumerate(PackedStrings.from_arrays(arrays, "vocabulary"))}
+
+
+class CompiledLogisticRegression(ChunkedPredictor):
+    def __init__(self, vocabulary, weights: np.ndarray, intercept: np.ndarray, classes: Sequence[str],
+                 token_pattern: str, lowercase: bool = True):
+        # weights: one row per vocabulary token, one column per class.
+        self.tokenizer = _Tokenizer(token_pattern, lowercase, vocabulary)
+        self.weights = weights
+        self.intercept = intercept
+        self.classes = list(classes)
+        self.info = f"compiled, {weights.shape[0]} tokens"
+
+    @classmethod
+    def from_model(cls, vectorizer, classifier) -> "CompiledLogisticRegression":
+        _check_vectorizer(vectorizer)
+
+        weights = np.ascontiguousarray(classifier.coef_.T, dtype=np.float64)
+        intercept = np.array(classifier.intercept_, dtype=np.float64)
+        if weights.shape[1] == 1:
+            # Binary models have a single decision column; the positive class wins only for scores > 0.
+            weights = np.hstack([np.zeros_like(weights), weights])
+            intercept = np.array([0.0, intercept[0]])
+
+        vocabulary = {token: int(index) for token, index in vectorizer.vocabulary_.items()}
+        return cls(vocabulary, weights, intercept, [str(c) for c in classifier.classes_], vectorizer.token_pattern,
+                   vectorizer.lowercase)
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        # Flat arrays plus JSON metadata, see data.static_tables. Weight rows follow the sorted vocabulary.
+        vocabulary = PackedStrings.from_strings(self.tokenizer.vocabulary, sort=True)
+        rows = [self.tokenizer.vocabulary.get(token) for token in vocabulary]
+        arrays = {"weights": self.weights[rows], "intercept": self.intercept, **vocabulary.to_arrays("vocabulary")}
+        meta = {"class": type(self).__name__, "classes": self.classes,
+                "token_pattern": self.tokenizer.token_regex.pattern, "lowercase": self.tokenizer.lowercase}
+
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> "CompiledLogisticRegression":
+        return cls(_vocabulary_from_arrays(arrays), arrays["weights"], arrays["intercept"],
+                   meta["classes"], meta["token_pattern"], meta["lowercase"])
+
+    def scores(self, sentence: str) -> np.ndarray:
+        counts = self.tokenizer.feature_counts(sentence)
+        if not counts:
+            return self.intercept
+
+        rows = sorted(counts)
+        return np.array([counts[row] for row in rows], dtype=np.float64) @ self.weights[rows] + self.intercept
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        return [self.classes[int(np.argmax(self.scores(sentence)))] for sentence in sentences]
+
+
+class CompiledDecisionTree(ChunkedPredictor):
+    def __init__(self, vocabulary, children_left: List[int], children_right: List[int], features: List[int],
+                 thresholds: List[float], leaf_labels: List[str], token_pattern: str, lowercase: bool = True):
+        # Flattened node arrays; leaf nodes have children_left == -1 and a label in leaf_labels.
+        self.tokenizer = _Tokenizer(token_pattern, lowercase, vocabulary)
+        self.children_left = children_left
+        self.children_right = children_right
+        self.features = features
+        self.thresholds = thresholds
+        self.leaf_labels = leaf_labels
+        self.info = f"compiled, {len(features)} nodes"
+
+    @classmethod
+    def from_model(cls, vectorizer, classifier) -> "CompiledDecisionTree":
+        _check_vectorizer(vectorizer)
+
+        tree = classifier.tree_
+        classes = [str(c) for c in classifier.classes_]
+        leaf_labels = [classes[int(np.argmax(value[0]))] for value in tree.value]
+
+        vocabulary = {token: int(index) for token, index in vectorizer.vocabulary_.items()}
+        return cls(vocabulary, tree.children_left.tolist(), tree.children_right.tolist(), tree.feature.tolist(),
+                   tree.threshold.tolist(), leaf_labels, vectorizer.token_pattern, vectorizer.lowercase)
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        vocabulary = PackedStrings.from_strings(self.tokenizer.vocabulary, sort=True)
+        new_feature = {self.tokenizer.vocabulary.get(token): i for i, token in enumerate(vocabulary)}
+        classes = sorted(set(self.leaf_labels))
+        arrays = {
+            "children_left": np.array(self.children_left, dtype=np.int64),
+            "children_right": np.array(self.children_right, dtype=np.int64),
+            "features": np.array([new_feature.get(f, -1) for f in self.features], dtype=np.int64),
+            "thresholds": np.array(self.thresholds, dtype=np.float64),
+            "leaf_classes": np.array([classes.index(label) for label in self.leaf_labels], dtype=np.int64),
+            **vocabulary.to_arrays("vocabulary")
+        }
+        meta = {"class": type(self).__name__, "classes": classes,
+                "token_pattern": self.tokenizer.token_regex.pattern, "lowercase": self.tokenizer.lowercase}
+
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> "CompiledDecisionTree":
+        # The nodes are walked one at a time, which is much faster on lists than on (memory-mapped) numpy arrays.
+        leaf_labels = [meta["classes"][c] for c in arrays["leaf_classes"].tolist()]
+        return cls(_vocabulary_from_arrays(arrays), arrays["children_left"].tolist(),
+                   arrays["children_right"].tolist(), arrays["features"].tolist(), arrays["thresholds"].tolist(),
+                   leaf_labels, meta["token_pattern"], meta["lowercase"])
+
+    def predict_one(self, sentence: str) -> str:
+        counts = self.tokenizer.feature_counts(sentence)
+        children_left = self.children_left
+
+        node = 0
+        while children_left[node] != -1:
+            if counts.get(self.features[node], 0) <= self.thresholds[node]:
+                node = children_left[node]
+            else:
+                node = self.children_right[node]
+
+        return self.leaf_labels[node]
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        return [self.predict_one(sentence) for sentence in sentences]
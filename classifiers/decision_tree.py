@@ -1,9 +1,12 @@
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.tree import DecisionTreeClassifier
 
+from classifiers.batching import ChunkedPredictor
+from classifiers.compiled import CompiledDecisionTree
 
-class DecisionTree:
-    def __init__(self, train_data):
+
+class DecisionTree(ChunkedPredictor):
+    def __init__(self, train_data, sample_weight=None):
         acts = [act for act, _ in train_data]
         sentences = [sentence for _, sentence in train_data]
 
@@ -11,7 +14,8 @@ class DecisionTree:
         X = vectorizer.fit_transform(sentences)
         classifier = DecisionTreeClassifier(criterion='gini', splitter='best', max_depth=None, min_samples_split=10,
                                             min_samples_leaf=1)
-        classifier = classifier.fit(X, acts)
+        # Note that min_samples_split counts rows, not weights, so weighted unique rows can split slightly differently.
+        classifier = classifier.fit(X, acts, sample_weight=sample_weight)
 
         self.classifier = classifier
         self.vectorizer = vectorizer
@@ -20,3 +24,6 @@ class DecisionTree:
     def predict(self, sentences):
         x_predict = self.vectorizer.transform(sentences)
         return self.classifier.predict(x_predict)
+
+    def compile(self) -> CompiledDecisionTree:
+        return CompiledDecisionTree.from_model(self.vectorizer, self.classifier)
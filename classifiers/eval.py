@@ -1,12 +1,29 @@
+import hashlib
+import inspect
+
 from classifiers.baseline_majority import BaselineMajority
 from classifiers.baseline_rulebased import BaselineRuleBased
+from classifiers.cascade import CascadeClassifier
+from classifiers.compiled import CompiledLogisticRegression, CompiledDecisionTree
+from classifiers.eval_cache import EvalCache, fingerprint, once
 
-from data.data_processor import train_data, dev_data, deduped_train_data, deduped_dev_data, ACTS
+from data.data_processor import train_data, dev_data, deduped_train_data, deduped_dev_data, ACTS, \
+    weighted_train_data, train_weights
 from classifiers.decision_tree import DecisionTree
 from classifiers.feedforward_nn import FeedForwardNN
 from classifiers.logistic_regression import LogisticRegressionModel
+from classifiers.nearest_neighbour import NearestNeighbourClassifier
 
 TRAINING = True
+USE_CACHE = True  # Set to False to retrain and re-evaluate every model regardless of cached results
+STORE_PREDICTIONS = True  # Also cache every prediction (e.g. for error analysis), not just the metrics
+
+eval_cache = EvalCache()
+
+
+def _metrics_version() -> str:
+    # Cached metrics are only reused as long as compute_metrics is unchanged; see cached_model_accuracy.
+    return hashlib.sha256(inspect.getsource(compute_metrics).encode()).hexdigest()
 
 
 if TRAINING:
@@ -16,38 +33,36 @@ else:
 print()
 
 
-def test_model_accuracy(model, model_name: str, deduped=False):
+def _testing_data(deduped=False):
     from data.data_processor import test_data, deduped_test_data
-    from collections import Counter
     if TRAINING:
-        testing_data = dev_data if not deduped else deduped_dev_data
+        return dev_data if not deduped else deduped_dev_data
     else:
-        testing_data = test_data if not deduped else deduped_test_data
+        return test_data if not deduped else deduped_test_data
 
-    test_sentences = [sentence for act, sentence in testing_data]
-    test_acts = [act for act, sentence in testing_data]
 
-    pred_acts = model.predict(test_sentences)
+def compute_metrics(labelled_predictions) -> dict:
+    # labelled_predictions is an iterable of (true act, predicted act); only counts are kept.
+    from collections import Counter
 
-    FP = []
-    TP = []
-    FN = []
-  
-    acts = Counter(test_acts)
-    for i in range(len(test_acts)):
-        if pred_acts[i] == test_acts[i]:
-            TP.append(test_acts[i])
+    FP = Counter()
+    TP = Counter()
+    FN = Counter()
+    acts = Counter()
+    total = 0
+
+    for test_act, pred_act in labelled_predictions:
+        total += 1
+        acts[test_act] += 1
+        if pred_act == test_act:
+            TP[test_act] += 1
         else:
-            FN.append(test_acts[i])
-            FP.append(pred_acts[i])
+            FN[test_act] += 1
+            FP[pred_act] += 1
 
-    TP = Counter(TP)
-    FN = Counter(FN)
-    FP = Counter(FP)
-    
-    correct = sum(pred_act == test_act for pred_act, test_act in zip(pred_acts, test_acts))
+    correct = sum(TP.values())
 
-    F1_dict = {}
+    per_act = {}
     for act in ACTS:
         if TP.get(act, 0) == 0:
             precision = 0
@@ -59,14 +74,78 @@ def test_model_accuracy(model, model_name: str, deduped=False):
             recall = TP[act]/(TP[act]+FN[act])
             F1 = 2*(precision*recall)/(precision+recall)
             accuracy = TP[act]/(TP[act]+FN[act]+FP[act])
-        print(f"{act} -- precision: {precision:.2f}, recall: {recall:.2f}, F1: {F1:.2f}, accuracy: {accuracy:.2f}, acts: {acts[act]}")
-        F1_dict[act] = F1
-    weighted_f1 = sum(F1_dict[key]*acts.get(key, 0) for key in acts) / len(test_acts)
-    macro_f1 = sum(F1_dict[key] for key in acts) / len(acts)
+        per_act[act] = {"precision": precision, "recall": recall, "F1": F1, "accuracy": accuracy, "acts": acts[act]}
+    weighted_f1 = sum(per_act[key]["F1"]*acts.get(key, 0) for key in acts) / total
+    macro_f1 = sum(per_act[key]["F1"] for key in acts) / len(acts)
+
+    return {"per_act": per_act, "accuracy": correct / total, "weighted_f1": weighted_f1, "macro_f1": macro_f1}
+
+
+def print_metrics(metrics: dict, model_name: str, info: str):
+    for act, m in metrics["per_act"].items():
+        print(f"{act} -- precision: {m['precision']:.2f}, recall: {m['recall']:.2f}, F1: {m['F1']:.2f}, "
+              f"accuracy: {m['accuracy']:.2f}, acts: {m['acts']}")
+
+    print(f"\n^^^^^^^^^^^^^^^^^\n{model_name} accuracy: {metrics['accuracy']:.2f}, weighted F1:"
+          f" {metrics['weighted_f1']:.2f}, macro F1: "
+          f"{metrics['macro_f1']:.2f} ({info})\n\n")
+
+
+def test_model_accuracy(model, model_name: str, deduped=False, testing_data=None, predictions: list = None):
+    from itertools import tee
+    if testing_data is None:
+        testing_data = _testing_data(deduped)
+
+    # testing_data can be any iterable of (act, sentence), e.g. iter_labelled_lines() over a huge file. Predictions are
+    # streamed chunk by chunk and only counts are kept, so memory doesn't grow with the number of sentences. tee only
+    # buffers the chunk that predict_iter is ahead by.
+    labelled, to_predict = tee(testing_data)
+    pred_acts = model.predict_iter(sentence for _, sentence in to_predict)
+    if predictions is not None:  # Only collected when asked for, e.g. to cache them
+        def collect(acts):
+            for act in acts:
+                predictions.append(str(act))
+                yield act
+
+        pred_acts = collect(pred_acts)
+
+    metrics = compute_metrics((test_act, pred_act) for (test_act, _), pred_act in zip(labelled, pred_acts))
+    print_metrics(metrics, model_name, model.info)
+    return metrics
+
+
+def cached_model_accuracy(build, model_name: str, fingerprint_parts: tuple, deduped=False, report=None):
+    # fingerprint_parts must include everything the model depends on: its classes (fingerprinted by source), training
+    # data and non-default hyperparameters. The model is only built when that combination wasn't evaluated before.
+    testing_data = _testing_data(deduped)
+    key = fingerprint(fingerprint_parts, testing_data)
+
+    entry = eval_cache.get(key) if USE_CACHE else None
+    if entry is not None and entry["predictions"] is None and entry.get("metrics_version") != _metrics_version():
+        entry = None  # Metrics computed by an older compute_metrics, and no predictions to recompute them from
+
+    if entry is None:
+        model = build()
+        predictions = [] if STORE_PREDICTIONS else None
+        metrics = test_model_accuracy(model, model_name, testing_data=testing_data, predictions=predictions)
+        entry = {
+            "model_name": model_name,
+            "info": model.info,
+            "predictions": predictions,
+            "metrics": metrics,
+            "metrics_version": _metrics_version(),
+            "report": report(model) if report else None,
+        }
+        eval_cache.put(key, entry)
+    else:
+        if entry["predictions"] is not None:  # Recomputed, so changes to compute_metrics apply to cached models too
+            entry["metrics"] = compute_metrics((act, prediction) for (act, _), prediction
+                                               in zip(testing_data, entry["predictions"]))
+        print_metrics(entry["metrics"], model_name, f"{entry['info']}, cached")
 
-    print(f"\n^^^^^^^^^^^^^^^^^\n{model_name} accuracy: {correct / len(testing_data):.2f}, weighted F1:"
-          f" {weighted_f1:.2f}, macro F1: "
-          f"{macro_f1:.2f} ({model.info})\n\n")
+    if entry["report"]:
+        print(entry["report"])
+    return entry["metrics"]
 
 
 train_acts = [act for act, _ in train_data]
@@ -77,32 +156,56 @@ deduped_train_acts = [act for act, _ in deduped_train_data]
 deduped_train_sentences = [sentence for _, sentence in deduped_train_data]
 
 
-baseline_majority = BaselineMajority(train_acts)
-test_model_accuracy(baseline_majority, "BaselineMajority")
+cached_model_accuracy(lambda: BaselineMajority(train_acts), "BaselineMajority", (BaselineMajority, train_acts))
+
+cached_model_accuracy(lambda: BaselineMajority(deduped_train_acts), "DedupedBaselineMajority",
+                      (BaselineMajority, deduped_train_acts), deduped=True)
+
+cached_model_accuracy(lambda: BaselineRuleBased(train_acts), "BaselineRuleBased", (BaselineRuleBased, train_acts))
+
+cached_model_accuracy(lambda: BaselineRuleBased(deduped_train_acts), "DedupedBaselineRuleBased",
+                      (BaselineRuleBased, deduped_train_acts), deduped=True)
+
+cached_model_accuracy(lambda: FeedForwardNN(train_data, dev_data), "FeedForwardNN",
+                      (FeedForwardNN, train_data, dev_data))
+
+# Not equivalent to FeedForwardNN above: fewer optimizer steps and very large per-row weights (see FeedForwardNN)
+cached_model_accuracy(lambda: FeedForwardNN(weighted_train_data, dev_data, sample_weight=train_weights),
+                      "WeightedFeedForwardNN", (FeedForwardNN, weighted_train_data, dev_data, train_weights))
+
+cached_model_accuracy(lambda: FeedForwardNN(deduped_train_data, deduped_dev_data, epochs=8), "DedupedFeedForwardNN",
+                      (FeedForwardNN, deduped_train_data, deduped_dev_data, {"epochs": 8}), deduped=True)
 
-deduped_baseline_majority = BaselineMajority(deduped_train_acts)
-test_model_accuracy(deduped_baseline_majority, "DedupedBaselineMajority", deduped=True)
+logistic_regression = once(lambda: LogisticRegressionModel(train_data))
+compiled_logistic_regression = once(lambda: logistic_regression().compile())
+cached_model_accuracy(logistic_regression, "LogisticRegressionModel", (LogisticRegressionModel, train_data), True)
+cached_model_accuracy(compiled_logistic_regression, "CompiledLogisticRegression",
+                      (LogisticRegressionModel, CompiledLogisticRegression, train_data), True)
 
-baseline_rulebased = BaselineRuleBased(train_acts)
-test_model_accuracy(baseline_rulebased, "BaselineRuleBased")
+cached_model_accuracy(lambda: CascadeClassifier(train_data, compiled_logistic_regression()), "CascadeClassifier",
+                      (CascadeClassifier, BaselineRuleBased, LogisticRegressionModel, CompiledLogisticRegression,
+                       train_data), deduped=False, report=lambda cascade: f"Cascade tier hit rates: {cascade.hit_rates()}\n\n")
 
-deduped_baseline_rulebased = BaselineRuleBased(deduped_train_acts)
-test_model_accuracy(deduped_baseline_rulebased, "DedupedBaselineRuleBased", deduped=True)
+cached_model_accuracy(lambda: LogisticRegressionModel(weighted_train_data, sample_weight=train_weights),
+                      "WeightedLogisticRegressionModel", (LogisticRegressionModel, weighted_train_data, train_weights))
 
-feedforward_nn = FeedForwardNN(train_data, dev_data)
-test_model_accuracy(feedforward_nn, "FeedForwardNN")
+cached_model_accuracy(lambda: LogisticRegressionModel(deduped_train_data), "DedupedLogisticRegressionModel",
+                      (LogisticRegressionModel, deduped_train_data), deduped=True)
 
-deduped_feedforward_nn = FeedForwardNN(deduped_train_data, deduped_dev_data, epochs=8)
-test_model_accuracy(deduped_feedforward_nn, "DedupedFeedForwardNN", deduped=True)
+decision_tree = once(lambda: DecisionTree(train_data))
+cached_model_accuracy(decision_tree, "DecisionTree", (DecisionTree, train_data))
+cached_model_accuracy(lambda: decision_tree().compile(), "CompiledDecisionTree",
+                      (DecisionTree, CompiledDecisionTree, train_data))
 
-logistic_regression = LogisticRegressionModel(train_data)
-test_model_accuracy(logistic_regression, "LogisticRegressionModel", True)
+cached_model_accuracy(lambda: DecisionTree(weighted_train_data, sample_weight=train_weights), "WeightedDecisionTree",
+                      (DecisionTree, weighted_train_data, train_weights))
 
-deduped_logistic_regression = LogisticRegressionModel(deduped_train_data)
-test_model_accuracy(deduped_logistic_regression, "DedupedLogisticRegressionModel", deduped=True)
+cached_model_accuracy(lambda: DecisionTree(deduped_train_data), "DedupedDecisionTree",
+                      (DecisionTree, deduped_train_data), deduped=True)
 
-decision_tree = DecisionTree(train_data)
-test_model_accuracy(decision_tree, "DecisionTree")
+# No dev_data: k would be chosen on the data it's evaluated on. Uses the default K, which was chosen on dev.
+cached_model_accuracy(lambda: NearestNeighbourClassifier(train_data), "NearestNeighbourClassifier",
+                      (NearestNeighbourClassifier, train_data))
 
-deduped_decision_tree = DecisionTree(deduped_train_data)
-test_model_accuracy(deduped_decision_tree, "DedupedDecisionTree", deduped=True)
+cached_model_accuracy(lambda: NearestNeighbourClassifier(deduped_train_data), "DedupedNearestNeighbourClassifier",
+                      (NearestNeighbourClassifier, deduped_train_data), deduped=True)
@@ -0,0 +1,60 @@
+import hashlib
+import inspect
+import json
+import os
+from functools import lru_cache
+from typing import Callable, Optional
+
+# Stores the predictions and metrics of an evaluation under a fingerprint of everything that determines them: the
+# source code of the model classes, their hyperparameters and the training and test data. Rerunning eval.py then only
+# retrains the models for which one of those changed.
+
+EVAL_CACHE_DIR = "eval_cache"
+
+
+@lru_cache(maxsize=None)
+def _source_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _encode(value):
+    # Classes are fingerprinted by name and by the source of the module defining them, so editing a classifier's
+    # module invalidates its results. Other values (e.g. numpy arrays of weights) by their list form.
+    if inspect.isclass(value):
+        return f"{value.__module__}.{value.__qualname__}:{_source_hash(inspect.getsourcefile(value))}"
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Can't fingerprint {type(value).__name__}")
+
+
+def fingerprint(*parts) -> str:
+    data = json.dumps(parts, sort_keys=True, default=_encode)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def once(build: Callable[[], object]) -> Callable[[], object]:
+    # For models several evaluations are derived from: built on the first cache miss that needs them, then reused.
+    return lru_cache(maxsize=None)(build)
+
+
+class EvalCache:
+    def __init__(self, path: str = EVAL_CACHE_DIR):
+        self.path = path
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._entry_path(key), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, entry: dict) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._entry_path(key) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._entry_path(key))  # Never leave a half-written entry behind
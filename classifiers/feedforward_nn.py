@@ -4,11 +4,12 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # Silence TensorFlow debug stuff
 
 import numpy as np
-from keras.preprocessing.text import Tokenizer
+from keras.preprocessing.text import Tokenizer, text_to_word_sequence
 from keras.models import Sequential
-from keras.layers import Dense
+from keras.layers import Dense, Input
+from scipy.sparse import csr_matrix
 
-from data.data_processor import ACTS
+from classifiers.batching import ChunkedPredictor
 
 
 VOCAB_SIZE = 1000
@@ -16,9 +17,48 @@ H_LAYER_SIZE = 128
 BATCH_SIZE = 5
 
 
-class FeedForwardNN:
+def fit_tokenizer(sentences: List[str], sample_weight: List[int] = None, vocab_size: int = VOCAB_SIZE) -> Tokenizer:
+    tokenizer = Tokenizer(num_words=vocab_size)
+    tokenizer.fit_on_texts(sentences)
+
+    if sample_weight is not None:
+        # Rebuild the word ranking from weighted counts, so the kept top vocab_size words are the same as when fitting
+        # on every duplicate. Ties keep first-seen order, as in fit_on_texts.
+        for word in tokenizer.word_counts:
+            tokenizer.word_counts[word] = 0
+        for sentence, weight in zip(sentences, sample_weight):
+            for word in text_to_word_sequence(sentence, tokenizer.filters, tokenizer.lower, tokenizer.split):
+                tokenizer.word_counts[word] += weight
+
+        ranked_words = sorted(tokenizer.word_counts.items(), key=lambda item: item[1], reverse=True)
+        tokenizer.word_index = {word: i for i, (word, _) in enumerate(ranked_words, start=1)}
+        tokenizer.index_word = {i: word for word, i in tokenizer.word_index.items()}
+
+    return tokenizer
+
+
+def texts_to_sparse_counts(tokenizer: Tokenizer, sentences: List[str]) -> csr_matrix:
+    # Same as tokenizer.texts_to_matrix(sentences, mode='count'), but memory grows with the number of words in the
+    # sentences instead of with rows x vocabulary size.
+    indices = []
+    indptr = [0]
+    for sequence in tokenizer.texts_to_sequences(sentences):  # Words outside the vocabulary are left out
+        indices.extend(sequence)
+        indptr.append(len(indices))
+
+    matrix = csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                        shape=(len(sentences), tokenizer.num_words))
+    matrix.sum_duplicates()  # Repeated words become counts
+    return matrix
+
+
+class FeedForwardNN(ChunkedPredictor):
     def __init__(self, training_data: List[Tuple[str, str]], dev_data: List[Tuple[str, str]] = None, epochs=2,
-                 debug=False):
+                 debug=False, sample_weight: List[int] = None, vocab_size: int = VOCAB_SIZE):
+        # sample_weight holds the duplicate counts of training_data rows (see data_processor.count_duplicates). The
+        # tokenizer ends up the same as with every duplicate, but the network doesn't: with a fixed number of epochs
+        # there are as many fewer optimizer steps as there are fewer rows (about 4.4x on our split), and a single row
+        # can carry a weight of ~2000 inside a batch of BATCH_SIZE. Only use it for comparison.
         print("Training neural network...")
 
         self.verbose = 1 if debug else 0
@@ -26,23 +66,26 @@ class FeedForwardNN:
         acts = [act for act, _ in training_data]
         sentences = [sentence for _, sentence in training_data]
 
-        act_mappings = {word: i for i, word in enumerate(ACTS)}
+        # Derived from the data instead of importing data_processor, which would load and split the whole corpus.
+        all_acts = sorted(set(acts) | set(act for act, _ in dev_data or []))
+        act_mappings = {word: i for i, word in enumerate(all_acts)}
         labels = [act_mappings[act] for act in acts]
 
-        # Roughly 1000 unique words in training set.
-        tokenizer = Tokenizer(num_words=VOCAB_SIZE)
-        tokenizer.fit_on_texts(sentences)
-        sequences = tokenizer.texts_to_matrix(sentences, mode='count')
+        # Roughly 1000 unique words in training set. Inputs are sparse all the way into the first layer, so a larger
+        # vocab_size only costs first-layer weights.
+        tokenizer = fit_tokenizer(sentences, sample_weight, vocab_size)
+        sequences = texts_to_sparse_counts(tokenizer, sentences)
 
         labels = np.array(labels)
-        one_hot_labels = np.zeros((len(labels), len(ACTS)))
+        one_hot_labels = np.zeros((len(labels), len(all_acts)))
         for i, label in enumerate(labels):
             one_hot_labels[i, label] = 1
 
         model = Sequential()
-        model.add(Dense(H_LAYER_SIZE, activation='relu', input_shape=(VOCAB_SIZE,)))
+        model.add(Input(shape=(vocab_size,), sparse=True))
+        model.add(Dense(H_LAYER_SIZE, activation='relu'))
         model.add(Dense(H_LAYER_SIZE, activation='relu'))
-        model.add(Dense(len(ACTS), activation='softmax'))
+        model.add(Dense(len(all_acts), activation='softmax'))
 
         model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
         validation_data = None
@@ -51,15 +94,18 @@ class FeedForwardNN:
             dev_sentences = [sentence for _, sentence in dev_data]
 
             dev_labels = np.array([act_mappings[act] for act in dev_acts])
-            dev_one_hot_labels = np.zeros((len(dev_labels), len(ACTS)))
+            dev_one_hot_labels = np.zeros((len(dev_labels), len(all_acts)))
             for i, label in enumerate(dev_labels):
                 dev_one_hot_labels[i, label] = 1
-            dev_sequences = tokenizer.texts_to_matrix(dev_sentences, mode='count')
+            dev_sequences = texts_to_sparse_counts(tokenizer, dev_sentences)
 
             validation_data = (dev_sequences, dev_one_hot_labels)
 
+        if sample_weight is not None:
+            sample_weight = np.array(sample_weight, dtype=np.float32)
+
         history = model.fit(sequences, one_hot_labels, epochs=epochs, batch_size=BATCH_SIZE,
-                            validation_data=validation_data, verbose=self.verbose)
+                            validation_data=validation_data, sample_weight=sample_weight, verbose=self.verbose)
         self.model = model
         self.tokenizer = tokenizer
         self.act_mappings = act_mappings
@@ -71,17 +117,12 @@ class FeedForwardNN:
 
         self.info = (f"train acc: {train_accuracy:.2f}, dev acc: {dev_accuracy:.2f}, "
                      f"batch: {BATCH_SIZE}, "
-                     f"hidden size: {H_LAYER_SIZE}, epochs: {epochs}, vocab size: {VOCAB_SIZE}")
+                     f"hidden size: {H_LAYER_SIZE}, epochs: {epochs}, vocab size: {vocab_size}")
 
     def predict(self, sentences: List[str]) -> List[str]:
-        new_sequences = self.tokenizer.texts_to_matrix(sentences, mode='count')
-        predicted_labels = self.model.predict(new_sequences, verbose=self.verbose).tolist()
+        new_sequences = texts_to_sparse_counts(self.tokenizer, sentences)
+        predicted_labels = self.model.predict(new_sequences, verbose=self.verbose)
 
         int_to_act = {i: word for word, i in self.act_mappings.items()}
 
-        predicted_acts = []
-        for predicted_label in predicted_labels:
-            label_index = predicted_label.index(max(predicted_label))
-            predicted_acts.append(int_to_act[label_index])
-
-        return predicted_acts
+        return [int_to_act[label_index] for label_index in np.argmax(predicted_labels, axis=1).tolist()]
@@ -1,11 +1,14 @@
 from sklearn.linear_model import LogisticRegression
 from sklearn.feature_extraction.text import CountVectorizer
 
+from classifiers.batching import ChunkedPredictor
+from classifiers.compiled import CompiledLogisticRegression
+
 MAX_ITER = 10000
 
 
-class LogisticRegressionModel:
-    def __init__(self, train_data):
+class LogisticRegressionModel(ChunkedPredictor):
+    def __init__(self, train_data, sample_weight=None):
         acts = []
         sentences = []
         for tup in train_data:
@@ -15,7 +18,7 @@ class LogisticRegressionModel:
         vectorizer = CountVectorizer()
         X = vectorizer.fit_transform(sentences)
         reg = LogisticRegression(max_iter=MAX_ITER)
-        fit = reg.fit(X, acts)
+        fit = reg.fit(X, acts, sample_weight=sample_weight)
 
         self.fit = fit
         self.vectorizer = vectorizer
@@ -24,3 +27,6 @@ class LogisticRegressionModel:
     def predict(self, sentences):
         X_test = self.vectorizer.transform(sentences)
         return self.fit.predict(X_test)
+
+    def compile(self) -> CompiledLogisticRegression:
+        return CompiledLogisticRegression.from_model(self.vectorizer, self.fit)
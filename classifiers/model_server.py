@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+from typing import List, Tuple
+
+sys.path.append(os.getcwd())  # When run as a script, so the classifiers package can be imported
+
+from classifiers.batching import ChunkedPredictor
+
+# Hosts one act classifier per machine, so dialog processes don't each import TensorFlow and hold their own model.
+# Messages are a 4-byte big-endian length followed by that many bytes of JSON:
+#   {"sentences": [...]} -> {"acts": [...]}
+#   {"info": true} -> {"info": "..."}
+# Any failure is answered with {"error": "..."}.
+
+DEFAULT_ADDRESS = "/tmp/dialog-act-classifier.sock"
+MAX_BATCH_SIZE = 256
+MAX_BATCH_WAIT = 0.002  # seconds to wait for other requests to batch with
+HEADER = struct.Struct(">I")
+
+
+def parse_address(address: str):
+    # "host:port" is TCP, anything else is a Unix socket path.
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    data = json.dumps(message).encode()
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError("Connection closed")
+        data += chunk
+    return data
+
+
+def receive_message(sock: socket.socket) -> dict:
+    size, = HEADER.unpack(_receive_exactly(sock, HEADER.size))
+    return json.loads(_receive_exactly(sock, size))
+
+
+class BatchingPredictor(threading.Thread):
+    def __init__(self, model):
+        # Requests from all connections go through one thread, which merges whatever arrives within MAX_BATCH_WAIT
+        # into a single model.predict call. Also keeps the model single-threaded.
+        super().__init__(name="batching-predictor", daemon=True)
+        self.model = model
+        self.requests = queue.Queue()
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        done = threading.Event()
+        result = {}
+        self.requests.put((sentences, done, result))
+        done.wait()
+
+        if "error" in result:
+            raise result["error"]
+        return result["acts"]
+
+    def run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            while size < MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.requests.get(timeout=MAX_BATCH_WAIT))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][0])
+
+            self._predict_batch(batch)
+
+    def _predict_batch(self, batch: List[Tuple[List[str], threading.Event, dict]]) -> None:
+        sentences = [sentence for request_sentences, _, _ in batch for sentence in request_sentences]
+        try:
+            acts = [str(act) for act in self.model.predict(sentences)] if sentences else []
+        except Exception as e:
+            if len(batch) > 1:
+                # Don't fail every client for one bad request: retry them one by one, so only that one gets the error.
+                for request in batch:
+                    self._predict_batch([request])
+                return
+
+            for _, done, result in batch:
+                result["error"] = e
+                done.set()
+            return
+
+        start = 0
+        for request_sentences, done, result in batch:
+            result["acts"] = acts[start:start + len(request_sentences)]
+            start += len(request_sentences)
+            done.set()
+
+
+class ModelRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        while True:
+            try:
+                request = receive_message(self.request)
+            except (EOFError, ConnectionError):
+                return
+            except ValueError as e:  # The whole frame was read, but isn't JSON; the connection is still usable
+                send_message(self.request, {"error": f"Invalid request: {e}"})
+                continue
+
+            try:
+                if not isinstance(request, dict):
+                    raise ValueError("Invalid request: expected a JSON object")
+                if request.get("info"):
+                    reply = {"info": self.server.model.info}
+                else:
+                    sentences = request["sentences"]
+                    # Checked before queueing, since the request is batched with those of other clients.
+                    if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+                        raise ValueError("Invalid request: sentences must be a list of strings")
+                    reply = {"acts": self.server.predictor.predict(sentences)}
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {e}"}
+
+            send_message(self.request, reply)
+
+
+def create_model_server(model, address: str = DEFAULT_ADDRESS) -> socketserver.BaseServer:
+    parsed_address = parse_address(address)
+    if isinstance(parsed_address, tuple):
+        server_class = socketserver.ThreadingTCPServer
+    else:
+        server_class = socketserver.ThreadingUnixStreamServer
+        if os.path.exists(parsed_address):
+            if not stat.S_ISSOCK(os.stat(parsed_address).st_mode):
+                raise ValueError(f"{parsed_address} exists and is not a socket; refusing to replace it")
+            os.remove(parsed_address)  # Left behind by a previous run
+
+    server = server_class(parsed_address, ModelRequestHandler)
+    server.daemon_threads = True
+    server.model = model
+    server.predictor = BatchingPredictor(model)
+    server.predictor.start()
+
+    return server
+
+
+class RemoteClassifier(ChunkedPredictor):
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        # Same predict() interface as the local classifiers, backed by a model server.
+        self.address = parse_address(address)
+        self.lock = threading.Lock()
+        self.sock = None
+        self.info = f"remote: {self._call({'info': True})['info']}"
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+        return sock
+
+    def _call(self, message: dict) -> dict:
+        with self.lock:
+            for attempt in range(2):  # Reconnect once, e.g. after the model server restarted
+                try:
+                    if self.sock is None:
+                        self.sock = self._connect()
+                    send_message(self.sock, message)
+                    reply = receive_message(self.sock)
+                    break
+                except (EOFError, OSError):
+                    if self.sock is not None:
+                        self.sock.close()
+                    self.sock = None
+                    if attempt:
+                        raise
+
+        if "error" in reply:
+            raise RuntimeError(f"Model server error: {reply['error']}")
+        return reply
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        return self._call({"sentences": list(sentences)})["acts"]
+
+
+if __name__ == "__main__":
+    from classifiers.registry import CLASSIFIERS, DEFAULT_CLASSIFIER, load_classifier
+    from data.data_processor import train_data, dev_data
+
+    parser = argparse.ArgumentParser(description="Serve a dialog act classifier to local dialog processes.")
+    parser.add_argument("--classifier", choices=list(CLASSIFIERS), default=DEFAULT_CLASSIFIER)
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="Unix socket path, or host:port for TCP.")
+    args = parser.parse_args()
+
+    model_server = create_model_server(load_classifier(args.classifier, train_data, dev_data), args.address)
+    print(f"Serving {args.classifier} on {args.address}.")
+    try:
+        model_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        model_server.server_close()
@@ -0,0 +1,108 @@
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from classifiers.batching import ChunkedPredictor
+
+K = 1  # Best on the dev split; used when there is no dev data to choose from K_CANDIDATES
+K_CANDIDATES = [1, 3, 5, 10]
+EXACT_SIMILARITY = 1 - 1e-6  # Cosine similarity of an utterance with the same words as a training utterance
+VOTE_MIN_PIECES = 16  # Slices per row when bounding the k-th largest similarity; more give a tighter bound
+VOTE_PIECES_PER_K = 8
+
+
+class NearestNeighbourClassifier(ChunkedPredictor):
+    def __init__(self, train_data: Iterable[Tuple[str, str]], dev_data: Sequence[Tuple[str, str]] = None,
+                 k: Optional[int] = None):
+        # There is no training: the unique (act, utterance) pairs are stored as rows of one L2-normalized sparse TF-IDF
+        # matrix, and a batch is classified with a single sparse product against it (cosine similarities). If a
+        # training utterance has the same words, only those rows vote. Otherwise the k most similar rows vote with
+        # their similarity times 1 + log(times seen): damped, so frequent utterances don't outvote closer ones.
+        # Without k, it's chosen on dev_data (or K without dev data).
+        self.k = k or K
+        self.counts = Counter()
+        self.update(train_data)
+
+        if k is None and dev_data:
+            self.k = self.select_k(dev_data)
+            self.info = f"k: {self.k} (chosen on dev data), {len(self.counts)} unique utterances"
+
+    def update(self, labelled_data: Iterable[Tuple[str, str]]) -> None:
+        # Adds labelled data, e.g. from new logs, and rebuilds the matrix. Only counting and one TF-IDF pass over the
+        # unique utterances, so it's usable right away.
+        self.counts.update(labelled_data)
+
+        pairs = list(self.counts)
+        self.classes = sorted(set(act for act, _ in pairs))
+        class_index = {act: i for i, act in enumerate(self.classes)}
+        self.row_classes = np.array([class_index[act] for act, _ in pairs])
+        row_counts = np.array([self.counts[pair] for pair in pairs], dtype=np.float64)
+        self.row_weights = 1 + np.log(row_counts)
+        self.fallback_class = int(np.bincount(self.row_classes, weights=row_counts).argmax())
+
+        self.vectorizer = TfidfVectorizer(norm="l2")
+        # Stored transposed (features x rows), so the product with a batch is CSR times CSR
+        self.matrix_t = self.vectorizer.fit_transform([utterance for _, utterance in pairs]).T.tocsr()
+        self.info = f"k: {self.k}, {len(pairs)} unique utterances"
+
+    def select_k(self, dev_data: Sequence[Tuple[str, str]], candidates: Sequence[int] = K_CANDIDATES) -> int:
+        # The similarities are computed once; only the voting is repeated per candidate.
+        similarities = self._similarities([sentence for _, sentence in dev_data])
+        correct = {}
+        for k in candidates:
+            predictions = self._vote(similarities, k)
+            correct[k] = sum(prediction == act for prediction, (act, _) in zip(predictions, dev_data))
+
+        return max(candidates, key=lambda k: (correct[k], -k))  # Ties go to the smallest k
+
+    def _similarities(self, sentences: List[str]):
+        return (self.vectorizer.transform(sentences) @ self.matrix_t).tocsr()
+
+    def _vote(self, similarities, k: int) -> List[str]:
+        # Vectorized over the CSR rows. Only candidates are ranked: entries at least as similar as a lower bound on
+        # their row's k-th largest similarity, the k-th largest of the maxima of VOTE_PIECES_PER_K * k slices of the
+        # row (those are row entries, so at least k entries reach it). That keeps the sort small without a loop.
+        n = similarities.shape[0]
+        indptr = similarities.indptr
+        lengths = np.diff(indptr)
+        scores = similarities.data
+
+        pieces = max(VOTE_MIN_PIECES, VOTE_PIECES_PER_K * k)
+        threshold = np.full(n, -np.inf)  # Rows with fewer entries than pieces keep all of them as candidates
+        long_rows = np.flatnonzero(lengths >= pieces)
+        if len(long_rows):
+            bounds = indptr[long_rows, None] + (lengths[long_rows, None] * np.arange(pieces + 1)) // pieces
+            bounds[:, -1] = np.minimum(bounds[:, -1], len(scores) - 1)  # Row ends only close the last slice
+            piece_max = np.maximum.reduceat(scores, bounds.ravel()).reshape(-1, pieces + 1)[:, :-1]
+            threshold[long_rows] = np.partition(piece_max, pieces - k, axis=1)[:, pieces - k]
+
+        candidates = np.flatnonzero(scores >= np.repeat(threshold, lengths))
+        rows = np.searchsorted(indptr, candidates, side="right") - 1
+        candidate_scores = scores[candidates]
+
+        # Rank within each row by sorting on (row, -similarity)
+        order = np.lexsort((-candidate_scores, rows))
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order)) - np.searchsorted(rows, rows[order])
+
+        # Exact matches are the most similar entries, so they are always candidates
+        exact = candidate_scores >= EXACT_SIMILARITY
+        has_exact = np.bincount(rows[exact], minlength=n) > 0
+        keep = np.where(has_exact[rows], exact, ranks < k)
+
+        neighbours = similarities.indices[candidates[keep]]
+        votes = np.bincount(rows[keep] * len(self.classes) + self.row_classes[neighbours],
+                            weights=candidate_scores[keep] * self.row_weights[neighbours],
+                            minlength=n * len(self.classes)).reshape(n, len(self.classes))
+
+        # Sentences sharing no word with the training data get the most frequent act
+        predictions = votes.argmax(axis=1)
+        predictions[votes.max(axis=1) == 0] = self.fallback_class
+        return [self.classes[prediction] for prediction in predictions]
+
+    def predict(self, sentences: List[str]) -> List[str]:
+        if not sentences:  # TfidfVectorizer.transform can't handle an empty batch
+            return []
+        return self._vote(self._similarities(sentences), self.k)
@@ -0,0 +1,121 @@
+import importlib
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Classifiers are referenced by name, and their modules (and with them sklearn or TensorFlow) are only imported once
+# one is selected. Keep this module free of heavy imports.
+
+DEFAULT_CLASSIFIER = "cascade"
+
+CLASSIFIERS: Dict[str, Tuple[str, Callable]] = {}
+
+# Classifiers whose built object has to_arrays(), so it can be built once and shared (see ARRAY_CLASSIFIERS)
+EXPORTABLE_CLASSIFIERS = set()
+
+# Classifiers that multi-process callers must get from a model server (classifiers/model_server.py) rather than build
+# in every process: training isn't seeded, so each process would answer with a different model, and TensorFlow
+# doesn't survive being forked once it's running.
+MODEL_SERVER_CLASSIFIERS = set()
+
+# module name -> (seconds spent importing it, number of modules it pulled in)
+IMPORT_TIMES: Dict[str, Tuple[float, int]] = {}
+
+
+def register(name: str, module_name: str, exportable: bool = False, needs_model_server: bool = False):
+    def decorator(build: Callable):
+        CLASSIFIERS[name] = (module_name, build)
+        if exportable:
+            EXPORTABLE_CLASSIFIERS.add(name)
+        if needs_model_server:
+            MODEL_SERVER_CLASSIFIERS.add(name)
+        return build
+
+    return decorator
+
+
+def import_classifier_module(module_name: str):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    modules_before = len(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = (time.perf_counter() - start, len(sys.modules) - modules_before)
+
+    return module
+
+
+def load_classifier(name: str, train_data: List[Tuple[str, str]], dev_data: List[Tuple[str, str]] = None,
+                    debug: bool = False):
+    if name not in CLASSIFIERS:
+        raise ValueError(f"Unknown classifier: {name} (choose from {', '.join(CLASSIFIERS)})")
+
+    module_name, build = CLASSIFIERS[name]
+    return build(import_classifier_module(module_name), train_data, dev_data, debug)
+
+
+# Classifiers that can be exported to flat arrays with to_arrays() and restored with from_arrays(), e.g. to share one
+# memory-mapped copy between processes. class name -> module name
+ARRAY_CLASSIFIERS = {
+    "CompiledLogisticRegression": "classifiers.compiled",
+    "CompiledDecisionTree": "classifiers.compiled",
+    "CascadeClassifier": "classifiers.cascade",
+}
+
+
+def classifier_from_arrays(arrays, meta: dict):
+    module = import_classifier_module(ARRAY_CLASSIFIERS[meta["class"]])
+    return getattr(module, meta["class"]).from_arrays(arrays, meta)
+
+
+def import_report() -> str:
+    lines = ["Classifier import times:"]
+    for module_name, (seconds, module_count) in IMPORT_TIMES.items():
+        lines.append(f"- {module_name}: {seconds:.3f}s, {module_count} modules")
+
+    return "\n".join(lines)
+
+
+def _weighted(train_data: List[Tuple[str, str]]):
+    from data.data_processor import count_duplicates
+    return count_duplicates(train_data)
+
+
+@register("majority", "classifiers.baseline_majority")
+def _build_majority(module, train_data, dev_data, debug):
+    return module.BaselineMajority([act for act, _ in train_data])
+
+
+@register("rulebased", "classifiers.baseline_rulebased")
+def _build_rulebased(module, train_data, dev_data, debug):
+    return module.BaselineRuleBased([act for act, _ in train_data])
+
+
+@register("logistic_regression", "classifiers.logistic_regression", exportable=True)
+def _build_logistic_regression(module, train_data, dev_data, debug):
+    weighted_train_data, train_weights = _weighted(train_data)
+    return module.LogisticRegressionModel(weighted_train_data, sample_weight=train_weights).compile()
+
+
+@register("decision_tree", "classifiers.decision_tree", exportable=True)
+def _build_decision_tree(module, train_data, dev_data, debug):
+    weighted_train_data, train_weights = _weighted(train_data)
+    return module.DecisionTree(weighted_train_data, sample_weight=train_weights).compile()
+
+
+@register("feedforward_nn", "classifiers.feedforward_nn", needs_model_server=True)
+def _build_feedforward_nn(module, train_data, dev_data, debug):
+    # Trained on every row: unlike the sklearn models, weighted unique rows don't give the same network (see
+    # FeedForwardNN).
+    return module.FeedForwardNN(train_data, dev_data, debug=debug)
+
+
+@register("cascade", "classifiers.cascade", exportable=True)
+def _build_cascade(module, train_data, dev_data, debug):
+    return module.CascadeClassifier(train_data, load_classifier("logistic_regression", train_data, dev_data, debug))
+
+
+@register("nearest_neighbour", "classifiers.nearest_neighbour")
+def _build_nearest_neighbour(module, train_data, dev_data, debug):
+    return module.NearestNeighbourClassifier(train_data, dev_data)
@@ -1,26 +1,47 @@
+from typing import Iterable, Iterator, List, Tuple
+
 from sklearn.model_selection import train_test_split
 
+# Fixed, so the splits (and with them cached evaluation results, see classifiers/eval_cache.py) are the same every run
+SPLIT_SEED = 28
 
-def extract_data():
-    with open('data/raw_data/dialog_acts.dat', 'r') as f:
-        dialog_acts = f.readlines()
 
-    data = [tuple(line.lower().strip().split(" ", maxsplit=1)) for line in dialog_acts]
+def count_duplicates(data: Iterable[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[int]]:
+    # Collapses identical (act, utterance) pairs in a single pass, keeping first-seen order. The counts can be used as
+    # sample weights, so training on the unique rows is equivalent to training on all of them.
+    counts = {}
+    for pair in data:
+        counts[pair] = counts.get(pair, 0) + 1
+
+    return list(counts), list(counts.values())
+
+
+def iter_labelled_lines(path: str = 'data/raw_data/dialog_acts.dat') -> Iterator[Tuple[str, str]]:
+    # Streams (act, utterance) pairs from a file in the dialog_acts.dat format, one line at a time.
+    with open(path, 'r') as f:
+        for line in f:
+            yield tuple(line.lower().strip().split(" ", maxsplit=1))
+
+
+def extract_data():
+    data = list(iter_labelled_lines())
 
     ACTS = list(set([act for act, _ in data]))
 
-    train_data, test_data = train_test_split(data, test_size=0.1)
-    train_data, dev_data = train_test_split(train_data, test_size=0.15)
+    train_data, test_data = train_test_split(data, test_size=0.1, random_state=SPLIT_SEED)
+    train_data, dev_data = train_test_split(train_data, test_size=0.15, random_state=SPLIT_SEED)
 
     # Now, using data, we remove all duplicates
-    deduped_data = list(set(data))
+    deduped_data = list(dict.fromkeys(data))  # Unlike set(), keeps the same order regardless of hash randomization
 
-    deduped_train_data, deduped_test_data = train_test_split(deduped_data, test_size=0.15)
+    deduped_train_data, deduped_test_data = train_test_split(deduped_data, test_size=0.15, random_state=SPLIT_SEED)
 
-    deduped_train_data, deduped_dev_data = train_test_split(deduped_train_data, test_size=0.15)
+    deduped_train_data, deduped_dev_data = train_test_split(deduped_train_data, test_size=0.15,
+                                                            random_state=SPLIT_SEED)
 
     return ACTS, train_data, dev_data, test_data, deduped_train_data, deduped_dev_data, deduped_test_data
 
 
 # To then be used in other files:
 ACTS, train_data, dev_data, test_data, deduped_train_data, deduped_dev_data, deduped_test_data = extract_data()
+weighted_train_data, train_weights = count_duplicates(train_data)
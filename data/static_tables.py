@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+# Read-only tables stored as flat .npy files, so that several processes can memory-map the same pages instead of each
+# holding its own copy of Python objects.
+
+
+class PackedStrings:
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, keys: Optional[np.ndarray] = None):
+        # String i is data[offsets[i]:offsets[i + 1]], utf-8 encoded. Tables built with sort=True also hold the sorted
+        # strings as a fixed-width bytes array (keys), which lookups search with np.searchsorted.
+        self.data = data
+        self.offsets = offsets
+        self.keys = keys
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str], sort: bool = False) -> "PackedStrings":
+        encoded = [s.encode() for s in strings]
+        keys = None
+        if sort:
+            # Sorting the utf-8 bytes gives the same order as numpy's comparison of the fixed-width keys.
+            encoded = sorted(set(encoded))
+            keys = np.array(encoded, dtype=f"S{max(map(len, encoded), default=1) or 1}")
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        return cls(data, offsets, keys)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _bytes(self, i: int) -> bytes:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._bytes(i).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def index(self, s: str) -> int:
+        # Only for sorted tables. Returns -1 if s isn't in the table.
+        if self.keys is None:
+            raise ValueError("Lookups need a table built with sort=True")
+
+        target = s.encode()
+        if len(target) > self.keys.itemsize:  # Would be truncated to the key width and could match a prefix
+            return -1
+
+        i = int(np.searchsorted(self.keys, target))
+        return i if i < len(self.keys) and self.keys[i] == target else -1
+
+    def get(self, s: str, default: Optional[int] = None) -> Optional[int]:
+        i = self.index(s)
+        return i if i >= 0 else default
+
+    def __contains__(self, s: str) -> bool:
+        return self.index(s) >= 0
+
+    def to_arrays(self, name: str) -> Dict[str, np.ndarray]:
+        arrays = {f"{name}_data": self.data, f"{name}_offsets": self.offsets}
+        if self.keys is not None:
+            arrays[f"{name}_keys"] = self.keys
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], name: str) -> "PackedStrings":
+        return cls(arrays[f"{name}_data"], arrays[f"{name}_offsets"], arrays.get(f"{name}_keys"))
+
+
+def _check_replaceable(path: str, partial: bool = False) -> None:
+    # save_arrays only ever replaces what it wrote before: a directory of .npy files plus meta.json (which a partial,
+    # temporary table may still miss). Anything else is an error, so a wrong --static-dir can't wipe e.g. the project.
+    if not os.path.lexists(path):
+        return
+
+    file_names = os.listdir(path) if os.path.isdir(path) and not os.path.islink(path) else None
+    if file_names is None or any(name != "meta.json" and not name.endswith(".npy") for name in file_names) \
+            or any(not os.path.isfile(os.path.join(path, name)) for name in file_names) \
+            or (not partial and "meta.json" not in file_names):
+        raise ValueError(f"{path} exists and is not a static table directory; refusing to replace it")
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], meta: dict = None) -> None:
+    # Writes to a temporary directory first, so processes never attach to a half-written table.
+    tmp_path = path + ".tmp"
+    _check_replaceable(path)
+    _check_replaceable(tmp_path, partial=True)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, name + ".npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta or {}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+
+
+def load_arrays(path: str) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for file_name in os.listdir(path):
+        if file_name.endswith(".npy"):
+            file_path = os.path.join(path, file_name)
+            try:
+                arrays[file_name[:-len(".npy")]] = np.load(file_path, mmap_mode="r")
+            except ValueError:  # Empty arrays can't be memory-mapped
+                arrays[file_name[:-len(".npy")]] = np.load(file_path)
+
+    return arrays
+
+
+def load_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        return json.load(f)
+
+
+def with_prefix(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    return {prefix + name: array for name, array in arrays.items()}
+
+
+def strip_prefix(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
@@ -0,0 +1,64 @@
+import random
+import string
+from typing import List, Sequence, Tuple
+
+# Synthetic corpora and catalogs of any size, made by resampling and perturbing the real data, for scaling benchmarks.
+# The label distribution and the kind of sentences stay close to the real data, while the perturbations keep the
+# vocabulary and the number of distinct utterances growing with the size (as they would with real logs).
+
+WORD_PERTURBATION_RATE = 0.1  # Chance per word of being replaced, dropped or misspelled
+
+# Catalog columns that are resampled independently, so new restaurants get new combinations of attributes
+CATALOG_ATTRIBUTE_COLUMNS = [1, 2, 3, 4, 5, 6]  # pricerange, area, crowdedness, length of stay, food, food quality
+
+
+def _misspell(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+
+
+def synthetic_acts(data: Sequence[Tuple[str, str]], size: int, seed: int = 0,
+                   perturbation_rate: float = WORD_PERTURBATION_RATE) -> List[Tuple[str, str]]:
+    # Resamples (act, utterance) pairs and perturbs words of the utterance: a word is replaced by another word seen
+    # with the same act, dropped or misspelled.
+    rng = random.Random(seed)
+    act_words = {}
+    for act, utterance in data:
+        act_words.setdefault(act, []).extend(utterance.split())
+
+    synthetic = []
+    for _ in range(size):
+        act, utterance = rng.choice(data)
+        words = []
+        for word in utterance.split():
+            if rng.random() >= perturbation_rate:
+                words.append(word)
+                continue
+
+            perturbation = rng.randrange(3)
+            if perturbation == 0:
+                words.append(rng.choice(act_words[act]))
+            elif perturbation == 1 and len(words) > 0:
+                continue  # Dropped, but never the first word, so no utterance ends up empty
+            else:
+                words.append(_misspell(word, rng))
+
+        synthetic.append((act, " ".join(words)))
+
+    return synthetic
+
+
+def synthetic_catalog(rows: Sequence[List[str]], size: int, seed: int = 0) -> List[List[str]]:
+    # Resamples restaurants with independently resampled attributes and a unique name. Contact details are copied.
+    rng = random.Random(seed)
+    columns = {column: [row[column] for row in rows] for column in CATALOG_ATTRIBUTE_COLUMNS}
+
+    catalog = []
+    for i in range(size):
+        row = list(rng.choice(rows))
+        row[0] = f"{row[0]} {i}"
+        for column, values in columns.items():
+            row[column] = rng.choice(values)
+        catalog.append(row)
+
+    return catalog
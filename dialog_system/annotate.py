@@ -0,0 +1,148 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.append(os.getcwd())
+
+from classifiers.batching import chunked
+from keyword_extractor import inform_keyword_finder, request_keyword_finder, LEVENSHTEIN_DISTANCE
+
+# Runs the dialog NLU (act classification, inform and request keyword extraction) over a file of utterances and writes
+# one JSON object per utterance. Input is streamed in chunks and spread over a process pool, with a bounded number of
+# chunks in flight, so files of any size run in constant memory.
+
+CHUNK_SIZE = 500
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+_classifier = None
+_levenshtein = LEVENSHTEIN_DISTANCE
+
+
+def _init_worker(classifier, classifier_server: Optional[str], levenshtein: int) -> None:
+    global _classifier, _levenshtein
+    if classifier_server:
+        # Sockets can't be shared between processes, so each worker connects by itself.
+        from classifiers.model_server import RemoteClassifier
+        classifier = RemoteClassifier(classifier_server)
+
+    _classifier = classifier
+    _levenshtein = levenshtein
+
+
+def read_utterances(path: str, labelled: bool) -> Iterator[Tuple[int, Optional[str], str]]:
+    # (line number, gold act or None, utterance). Labelled files use the dialog_acts.dat format: "<act> <utterance>".
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.lower().strip()
+            if not line:
+                continue
+
+            if labelled:
+                act, _, utterance = line.partition(" ")
+                yield line_number, act, utterance
+            else:
+                yield line_number, None, line
+
+
+def annotate_chunk(chunk: List[Tuple[int, Optional[str], str]]) -> List[dict]:
+    start = time.perf_counter()
+    acts = _classifier.predict([utterance for _, _, utterance in chunk])
+    classify_ms = (time.perf_counter() - start) * 1000 / len(chunk)  # Classified as one batch, so amortized
+
+    annotations = []
+    for (line_number, gold_act, utterance), act in zip(chunk, acts):
+        start = time.perf_counter()
+        inform = inform_keyword_finder(utterance, levenshtein_distance=_levenshtein)
+        request = request_keyword_finder(utterance, _levenshtein)
+        extract_ms = (time.perf_counter() - start) * 1000
+
+        annotation = {
+            "line": line_number,
+            "utterance": utterance,
+            "act": str(act),
+            # An unspecified "any" has no slot, which inform_keyword_finder reports under None.
+            "inform": {str(slot): [value for value, _ in values] for slot, values in inform.items()},
+            "request": sorted(request),
+            "typos": [value for values in inform.values() for value, is_correct in values if not is_correct],
+            "classify_ms": round(classify_ms, 4),
+            "extract_ms": round(extract_ms, 4),
+        }
+        if gold_act is not None:
+            annotation["gold_act"] = gold_act
+        annotations.append(annotation)
+
+    return annotations
+
+
+def annotate_file(input_path: str, output_path: str, classifier, processes: int, labelled: bool,
+                  classifier_server: Optional[str] = None, levenshtein: int = LEVENSHTEIN_DISTANCE,
+                  chunk_size: int = CHUNK_SIZE) -> int:
+    # Prefer fork, so workers inherit the classifier and keyword tables instead of rebuilding them. That's unsafe once
+    # TensorFlow is running (predict can deadlock in the children), so its models have to come from a model server.
+    if classifier is not None and "tensorflow" in sys.modules:
+        raise ValueError("TensorFlow classifiers can't be shared with forked workers; use a classifier server")
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    count = 0
+    with context.Pool(processes, initializer=_init_worker,
+                      initargs=(classifier, classifier_server, levenshtein)) as pool, open(output_path, "w") as out:
+        pending = deque()
+        for chunk in chunked(read_utterances(input_path, labelled), chunk_size):
+            pending.append(pool.apply_async(annotate_chunk, (chunk,)))
+            # Pool.imap would queue the whole file up front; keep only a few chunks per process in flight.
+            while len(pending) >= processes * CHUNKS_IN_FLIGHT_PER_PROCESS:
+                count += _write_annotations(out, pending.popleft().get())
+
+        while pending:
+            count += _write_annotations(out, pending.popleft().get())
+
+    return count
+
+
+def _write_annotations(out, annotations: List[dict]) -> int:
+    for annotation in annotations:
+        out.write(json.dumps(annotation) + "\n")
+    return len(annotations)
+
+
+if __name__ == "__main__":
+    from classifiers.registry import CLASSIFIERS, DEFAULT_CLASSIFIER, MODEL_SERVER_CLASSIFIERS
+
+    parser = argparse.ArgumentParser(description="Annotate a file of utterances with dialog acts and slots (JSONL).")
+    parser.add_argument("input", help="Utterance file: one utterance per line, or dialog_acts.dat format.")
+    parser.add_argument("output", help="JSONL file to write.")
+    parser.add_argument("--format", choices=["dat", "text"], default=None,
+                        help="dat: lines start with a gold act, as in dialog_acts.dat. text: one utterance per line. "
+                             "Defaults to dat for .dat files.")
+    parser.add_argument("--classifier", choices=list(CLASSIFIERS), default=DEFAULT_CLASSIFIER)
+    parser.add_argument("--classifier-server", default=None, help="Use the classifier of a running model server.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--levenshtein", type=int, default=LEVENSHTEIN_DISTANCE)
+    args = parser.parse_args()
+
+    if args.classifier in MODEL_SERVER_CLASSIFIERS and not args.classifier_server:
+        parser.error(f"--classifier {args.classifier} requires --classifier-server "
+                     f"(run classifiers/model_server.py --classifier {args.classifier})")
+
+    labelled = (args.format or ("dat" if args.input.endswith(".dat") else "text")) == "dat"
+
+    classifier = None
+    if not args.classifier_server:
+        from classifiers.registry import load_classifier
+        from data.data_processor import train_data, dev_data
+        classifier = load_classifier(args.classifier, train_data, dev_data)
+
+    start = time.perf_counter()
+    count = annotate_file(args.input, args.output, classifier, args.processes, labelled, args.classifier_server,
+                          args.levenshtein, args.chunk_size)
+    seconds = time.perf_counter() - start
+    print(f"Annotated {count} utterances in {seconds:.1f}s ({count / seconds:.0f} utterances/s) with "
+          f"{args.processes} processes.", file=sys.stderr)
@@ -0,0 +1,81 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from data.synthetic import synthetic_catalog
+from dialog_state import DialogState, Restaurant
+from reasoning import Reasoning
+from shared_static import read_catalog_rows
+
+# Latency of computing suggestions and applying the reasoning rules to them, over synthetic catalogs of growing size.
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+QUERIES = 200
+ANY_RATE = 0.2  # Chance per preference of being "any", as when the user doesn't care
+
+
+def random_preferences(restaurants, rng: random.Random):
+    preferences = []
+    for attribute in ("pricerange", "area", "food"):
+        preferences.append(["any"] if rng.random() < ANY_RATE else [getattr(rng.choice(restaurants), attribute)])
+    return preferences
+
+
+def benchmark_catalog(restaurants, queries: int, rng: random.Random) -> dict:
+    reasoning = Reasoning()
+    suggestion_seconds = reasoning_seconds = 0.0
+    suggestion_count = 0
+
+    for _ in range(queries):
+        # A new state for every query, so no suggestions are served from its cache
+        dialog_state = DialogState()
+        pricerange, area, food = random_preferences(restaurants, rng)
+        dialog_state.set_price_range(pricerange)
+        dialog_state.set_area(area)
+        dialog_state.set_food(food)
+
+        start = time.perf_counter()
+        suggestions = dialog_state.calculate_suggestions(restaurants)
+        suggestion_seconds += time.perf_counter() - start
+        suggestion_count += len(suggestions)
+
+        start = time.perf_counter()
+        for consequent in reasoning.all_consequents:
+            list(reasoning.get_extra_requirements_suggestions(suggestions, consequent))
+        reasoning_seconds += time.perf_counter() - start
+
+    return {
+        "catalog_size": len(restaurants),
+        "suggestions_ms": round(suggestion_seconds / queries * 1000, 4),
+        "reasoning_ms": round(reasoning_seconds / queries * 1000, 4),
+        "mean_suggestions": round(suggestion_count / queries, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suggestions and reasoning on synthetic catalogs.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as CSV.")
+    args = parser.parse_args()
+
+    rows = read_catalog_rows()
+    results = []
+    for size in args.sizes:
+        restaurants = [Restaurant(*row, id=i) for i, row in enumerate(synthetic_catalog(rows, size, seed=args.seed))]
+        result = benchmark_catalog(restaurants, args.queries, random.Random(args.seed))
+        results.append(result)
+        print(f"{size:>8} restaurants: suggestions {result['suggestions_ms']:.3f} ms, reasoning "
+              f"{result['reasoning_ms']:.3f} ms, {result['mean_suggestions']} suggestions per query")
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
@@ -47,6 +47,8 @@ class Config:
 
 
 def create_config_parser():
+    from classifiers.registry import CLASSIFIERS, DEFAULT_CLASSIFIER
+
     parser = argparse.ArgumentParser(description="Configure system settings.")
     parser.add_argument("--capslock", type=bool, default=CAPS_LOCK, help="Enable or disable caps lock.")
     parser.add_argument("--typocheck", type=bool, default=TYPO_CHECK, help="Enable or disable typo double-checking.")
@@ -55,5 +57,24 @@ def create_config_parser():
     parser.add_argument("--debug-mode", type=bool, default=DEBUG_MODE, help="Enable or disable debug mode.")
     parser.add_argument("--version0", action='store_false', help="Enable or disable informal mode (if False, "
                                                                         "system will use 'neutral' language.")
+    parser.add_argument("--classifier", choices=list(CLASSIFIERS), default=DEFAULT_CLASSIFIER,
+                        help="Dialog act classifier to use. Only the selected classifier's module is imported.")
+    parser.add_argument("--shadow-classifier", choices=list(CLASSIFIERS), default=None,
+                        help="Also run this classifier on every utterance in the background and log how often it "
+                             "disagrees with --classifier, and how fast it is, per act. Never delays a response.")
+    parser.add_argument("--shadow-log", default="shadow.log", help="Log file for the shadow classifier.")
+    parser.add_argument("--classifier-server", default=None,
+                        help="Use the classifier hosted by classifiers/model_server.py at this address (a Unix socket "
+                             "path or host:port) instead of loading one in this process.")
+    parser.add_argument("--profile-startup", metavar="REPORT_PATH", default=None,
+                        help="Record wall time and tracemalloc allocations for each startup phase and module import, "
+                             "and write a report to this file.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run as a server with this many dialog worker processes instead of in the console.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the server listens on.")
+    parser.add_argument("--port", type=int, default=8028, help="Port the server listens on.")
+    parser.add_argument("--session-dir", default=".", help="Directory for the workers' session databases.")
+    parser.add_argument("--static-dir", default="static_tables",
+                        help="Directory for the catalog, word list and classifier tables shared by the workers.")
 
     return parser
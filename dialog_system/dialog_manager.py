@@ -5,19 +5,25 @@ from typing import List, Dict, Optional
 from config import Config
 from dialog_state import DialogState, Restaurant, PreferenceRequest
 from keyword_extractor import inform_keyword_finder, adjusted_levenshtein, request_keyword_finder
+from session_store import SessionStore
+from shadow import ShadowEvaluator
 
 
 class DialogManager:
-    def __init__(self, act_classifier, config: Config = None):
+    def __init__(self, act_classifier, config: Config = None, catalog_rows: List[List[str]] = None):
         self.act_classifier = act_classifier
+        self.classifier_ready = True  # False while a BackgroundClassifierLoader is still building the classifier
+        self.shadow_evaluator: Optional[ShadowEvaluator] = None
         self.all_restaurants = []
 
-        with open('data/raw_data/restaurant_info.csv', 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                self.all_restaurants.append(Restaurant(*row))
+        if catalog_rows is None:
+            with open('data/raw_data/restaurant_info.csv', 'r') as f:
+                reader = csv.reader(f)
+                next(reader)  # Skip header
+                catalog_rows = list(reader)
 
-        self.all_restaurants.pop(0)  # Remove header
+        for row in catalog_rows:
+            self.all_restaurants.append(Restaurant(*row, id=len(self.all_restaurants)))
 
         self.foodlist = set(r.food for r in self.all_restaurants)
 
@@ -29,10 +35,11 @@ class DialogManager:
         from strings import strings
         self.strings = strings["informal" if self.config.informal else "neutral"]["DIALOG_MANAGER"]
 
-    def transition(self, dialog_state: DialogState, utterance: str) -> DialogState:
+    def transition(self, dialog_state: DialogState, utterance: str, interactive: bool = True) -> DialogState:
         # We keep the implementation for the dialog system and the reasoning component separate. If a suggestion is
         # made, we inform the user that they can ask for additional requirements. If they do, we leave the dialog system
         # (which implements 1b), and move to the reasoning component (which implements 1c).
+        # With interactive=False (server workers) nothing is printed, slept on or read from stdin.
         if adjusted_levenshtein("additional requirements", utterance) < dialog_state.config.levenshtein:
             dialog_state.extra_requirements_suggestions = dialog_state.calculate_suggestions(self.all_restaurants)
             dialog_state.system_message = ""
@@ -44,10 +51,17 @@ class DialogManager:
             return dialog_state
 
         if utterance == "-config":
-            dialog_state.config.update_config()
+            if interactive:
+                dialog_state.config.update_config()
+            else:  # update_config prompts on stdin, and the config is shared by every session of a worker
+                dialog_state.system_message = self.strings["CONFIG_UNAVAILABLE"]
             return dialog_state
 
-        act = self.act_classifier.predict([utterance])[0]
+        act_classifier = self.act_classifier  # Can be swapped by a background loader at any time
+        act = act_classifier.predict([utterance])[0]
+        if self.shadow_evaluator and self.classifier_ready:
+            # While the fallback classifier answers, the disagreements wouldn't be with the configured classifier
+            self.shadow_evaluator.submit(utterance, act)
 
         extracted_preferences = self.extract_preferences(utterance, dialog_state.current_preference_request,
                                                          dialog_state.config.levenshtein)
@@ -72,12 +86,13 @@ class DialogManager:
                     dialog_state.confirm_typo = False
 
         extracted_preferences = {k: [v[0] for v in value] for k, value in extracted_preferences.items()}
-        if dialog_state.config.debug_mode:
+        if dialog_state.config.debug_mode and interactive:
             print("act: ", act)
+            print(f"classifier: {type(act_classifier).__name__} (ready: {self.classifier_ready})")
             print("current prefs: ", dialog_state._pricerange, dialog_state._area, dialog_state._food)
             print("extracted prefs: ", extracted_preferences)
 
-        if act == "repeat":
+        if act == "repeat" and interactive:  # Otherwise the unchanged system_message is simply sent again
             dialog_state.output_system_message()
 
         if act == "hello":
@@ -147,11 +162,17 @@ class DialogManager:
             dialog_state = DialogState(self.config)
             dialog_state.ask_for_missing_info()
 
-        if dialog_state.config.debug_mode:
+        if dialog_state.config.debug_mode and interactive:
             print(f"new prefs: {dialog_state._pricerange=}, {dialog_state._area=}, {dialog_state._food=}")
 
         return dialog_state
 
+    def set_shadow_classifier(self, classifier) -> None:
+        # Classifies every utterance with `classifier` too, in the background, to compare it with act_classifier.
+        shadow_evaluator = ShadowEvaluator(classifier)
+        shadow_evaluator.start()
+        self.shadow_evaluator = shadow_evaluator
+
     def converse(self) -> Optional[List[Restaurant]]:
         dialog_state = DialogState(self.config)
         dialog_state.system_message = self.strings["WELCOME"]
@@ -160,6 +181,7 @@ class DialogManager:
         dialog_state.ask_for_missing_info()
         dialog_state.output_system_message()
         while not dialog_state.conversation_over:
+            self.speculate(dialog_state)  # The message is already out, so this is idle time
             user_input = input("> ").lower().strip()
 
             dialog_state = self.transition(dialog_state, user_input)
@@ -170,6 +192,31 @@ class DialogManager:
 
         return None
 
+    def respond(self, sessions: SessionStore, session_id: str, utterance: str = "") -> DialogState:
+        # Handles one turn of a session without blocking on input(); the reply is in the returned system_message.
+        # "additional requirements" ends the session with its suggestions in extra_requirements_suggestions; the
+        # reasoning step that follows it in the console (handle_reasoning) is interactive and isn't run here.
+        dialog_state = sessions.get(session_id)
+        if dialog_state is None:
+            dialog_state = DialogState(self.config)
+            dialog_state.ask_for_missing_info()
+            dialog_state.system_message = self.strings["WELCOME"] + "\n" + dialog_state.system_message
+
+        if utterance:
+            dialog_state = self.transition(dialog_state, utterance.lower().strip(), interactive=False)
+
+        if dialog_state.conversation_over:
+            sessions.delete(session_id)
+        else:
+            sessions.put(session_id, dialog_state)
+
+        return dialog_state
+
+    def speculate(self, dialog_state: DialogState) -> None:
+        # Precomputes the likely next suggestion and request strings; see DialogState.speculate.
+        if not dialog_state.conversation_over:
+            dialog_state.speculate(self.all_restaurants)
+
     @staticmethod
     def extract_preferences(user_input: str, preference_type: PreferenceRequest, levenshtein_distance: int) -> Dict[str, List[str]]:
         return inform_keyword_finder(user_input, preference_type.value, levenshtein_distance)
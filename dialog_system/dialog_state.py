@@ -1,7 +1,10 @@
+import itertools
+import json
+import sys
 import time
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional, Set
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
 from config import Config
 
@@ -18,6 +21,10 @@ class Restaurant:
     phone: str
     address: str
     postcode: str
+    id: int = -1  # Position in DialogManager.all_restaurants
+
+
+REQUESTABLE_INFO = ["phone number", "address", "postcode"]
 
 
 class PreferenceRequest(Enum):
@@ -28,11 +35,18 @@ class PreferenceRequest(Enum):
 
 
 class DialogState:
+    # Sessions can be kept around in large numbers (see SessionStore), so keep them small: no __dict__, restaurants
+    # excluded by id and interned preference strings.
+    __slots__ = ("_pricerange", "_area", "_food", "_excluded_restaurants", "conversation_over", "current_suggestion",
+                 "current_suggestions_index", "system_message", "current_preference_request",
+                 "extra_requirements_suggestions", "previous_preferences", "confirm_typo", "previous_act", "typo_list",
+                 "config", "strings", "_speculation")
+
     def __init__(self, config=None):
         self._pricerange: List[str] = []
         self._area: List[str] = []
         self._food: List[str] = []
-        self._excluded_restaurants: List[Restaurant] = []
+        self._excluded_restaurants: Set[int] = set()
         self.conversation_over = False
         self.current_suggestion: Optional[Restaurant] = None
         self.current_suggestions_index = 0
@@ -52,6 +66,10 @@ class DialogState:
         from strings import strings
         self.strings = strings["informal" if self.config.informal else "neutral"]["DIALOG_STATE"]
 
+        # Results precomputed by speculate() while waiting for the user. Not serialized; dropped when preferences or
+        # exclusions change.
+        self._speculation: Optional[Dict] = None
+
     def output_system_message(self) -> None:
         if self.system_message:
             time.sleep(self.config.system_delay)
@@ -61,26 +79,64 @@ class DialogState:
                 print(self.system_message)
 
     def set_price_range(self, pricerange: List[str]) -> None:
-        self._pricerange = pricerange
+        self._pricerange = [sys.intern(p) for p in pricerange]
         self.current_suggestions_index = 0
+        self._speculation = None
 
     def set_area(self, area: List[str]) -> None:
-        self._area = area
+        self._area = [sys.intern(a) for a in area]
         self.current_suggestions_index = 0
+        self._speculation = None
 
     def set_food(self, food: List[str]) -> None:
-        self._food = food
+        self._food = [sys.intern(f) for f in food]
         self.current_suggestions_index = 0
+        self._speculation = None
 
     def add_excluded_restaurant(self, restaurant: Restaurant) -> None:
-        self._excluded_restaurants.append(restaurant)
+        self._excluded_restaurants.add(restaurant.id)
         self.current_suggestions_index = 0
+        self._speculation = None
 
     def set_excluded_restaurants(self, excluded_restaurants: List[Restaurant]) -> None:
-        self._excluded_restaurants = excluded_restaurants
+        self._excluded_restaurants = set(r.id for r in excluded_restaurants)
         self.current_suggestions_index = 0
+        self._speculation = None
+
+    def _suggestions_key(self, restaurants: List[Restaurant]) -> Tuple:
+        return (id(restaurants), tuple(self._pricerange), tuple(self._area), tuple(self._food),
+                frozenset(self._excluded_restaurants))
+
+    def clear_speculation(self) -> None:
+        self._speculation = None
+
+    def speculate(self, restaurants: List[Restaurant]) -> None:
+        # Called while waiting for the next utterance. After a confirmation the user usually affirms, after a
+        # suggestion they usually ask for its info or an alternative, so compute those results ahead of time.
+        if not self.can_make_suggestion():
+            return
+
+        suggestions = self.calculate_suggestions(restaurants)
+        speculation = self._speculation
+
+        if self.current_suggestions_index < len(suggestions):
+            next_suggestion = suggestions[self.current_suggestions_index]
+            speculation["suggestion_strings"][next_suggestion.id] = self._format_suggestion_string(next_suggestion)
+
+        if self.current_suggestion:
+            for size in range(1, len(REQUESTABLE_INFO) + 1):
+                for requested_info in itertools.combinations(REQUESTABLE_INFO, size):
+                    key = (self.current_suggestion.id, frozenset(requested_info))
+                    speculation["request_strings"][key] = self._format_request_string(self.current_suggestion,
+                                                                                      set(requested_info))
 
     def suggestion_string(self, suggestion: Restaurant, ask_for_additional=True) -> str:
+        if ask_for_additional and self._speculation and suggestion.id in self._speculation["suggestion_strings"]:
+            return self._speculation["suggestion_strings"][suggestion.id]
+
+        return self._format_suggestion_string(suggestion, ask_for_additional)
+
+    def _format_suggestion_string(self, suggestion: Restaurant, ask_for_additional=True) -> str:
         suggestion_str = self.strings["SUGGESTION_STRING"]["INITIAL"].format(suggestion=suggestion)
         if ask_for_additional:
             suggestion_str += " " + self.strings["SUGGESTION_STRING"]["ASK_ADDITIONAL_REQS"]
@@ -88,6 +144,13 @@ class DialogState:
         return suggestion_str
 
     def request_string(self, suggestion: Restaurant, requested_info: Set[str]) -> str:
+        key: Tuple[int, FrozenSet[str]] = (suggestion.id, frozenset(requested_info))
+        if self._speculation and key in self._speculation["request_strings"]:
+            return self._speculation["request_strings"][key]
+
+        return self._format_request_string(suggestion, requested_info)
+
+    def _format_request_string(self, suggestion: Restaurant, requested_info: Set[str]) -> str:
         unknown_string = self.strings["REQUEST_STRING"]["UNKNOWN"]
         request_string = self.strings["REQUEST_STRING"]["INITIAL"].format(suggestion=suggestion)
 
@@ -121,16 +184,21 @@ class DialogState:
             self.system_message = self.strings["SUGGESTION_STRING"]["NO_SUGGESTION_AVAILABLE"]
 
     def calculate_suggestions(self, restaurants: List[Restaurant]) -> List[Restaurant]:
+        key = self._suggestions_key(restaurants)
+        if self._speculation and self._speculation["key"] == key:
+            return self._speculation["suggestions"]
+
         suggestions = []
         for r in restaurants:
             if (
                     (r.pricerange in self._pricerange or "any" in self._pricerange) and
                     (r.area in self._area or "any" in self._area) and
                     (r.food in self._food or "any" in self._food) and
-                    r not in self._excluded_restaurants
+                    r.id not in self._excluded_restaurants
             ):
                 suggestions.append(r)
 
+        self._speculation = {"key": key, "suggestions": suggestions, "suggestion_strings": {}, "request_strings": {}}
         return suggestions
 
     def ask_for_missing_info(self) -> None:
@@ -180,3 +248,38 @@ class DialogState:
     def confirm_levenshtein(self) -> None:
         self.system_message = self.strings["LEVENSHTEIN"]["CONFIRM"].format(typo_list=' and '.join(self.typo_list))
         self.typo_list = []
+
+    def to_bytes(self) -> bytes:
+        # Restaurants are stored by id; config and strings aren't stored and are supplied again by from_bytes.
+        state = [
+            self._pricerange, self._area, self._food, sorted(self._excluded_restaurants), self.conversation_over,
+            self.current_suggestion.id if self.current_suggestion else -1, self.current_suggestions_index,
+            self.system_message, self.current_preference_request.value,
+            [r.id for r in self.extra_requirements_suggestions], self.previous_preferences, self.confirm_typo,
+            self.previous_act, self.typo_list
+        ]
+        return json.dumps(state, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, restaurants: List[Restaurant], config=None) -> "DialogState":
+        (pricerange, area, food, excluded_restaurants, conversation_over, current_suggestion, current_suggestions_index,
+         system_message, current_preference_request, extra_requirements_suggestions, previous_preferences,
+         confirm_typo, previous_act, typo_list) = json.loads(data)
+
+        dialog_state = cls(config)
+        dialog_state.set_price_range(pricerange)
+        dialog_state.set_area(area)
+        dialog_state.set_food(food)
+        dialog_state._excluded_restaurants = set(excluded_restaurants)
+        dialog_state.conversation_over = conversation_over
+        dialog_state.current_suggestion = restaurants[current_suggestion] if current_suggestion >= 0 else None
+        dialog_state.current_suggestions_index = current_suggestions_index
+        dialog_state.system_message = system_message
+        dialog_state.current_preference_request = PreferenceRequest(current_preference_request)
+        dialog_state.extra_requirements_suggestions = [restaurants[i] for i in extra_requirements_suggestions]
+        dialog_state.previous_preferences = previous_preferences
+        dialog_state.confirm_typo = confirm_typo
+        dialog_state.previous_act = previous_act
+        dialog_state.typo_list = typo_list
+
+        return dialog_state
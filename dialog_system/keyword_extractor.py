@@ -1,24 +1,36 @@
+import os
 import re
 from typing import Set
 
 import Levenshtein
-import nltk
-import pandas as pd
 
-nltk.download('words', quiet=True)
+from shared_static import STATIC_TABLES_ENV
 
-from nltk.corpus import words
+if os.environ.get(STATIC_TABLES_ENV):
+    # Server workers attach to the shared tables written by the front process instead of loading nltk and pandas.
+    from shared_static import StaticTables
 
-words_set = set(words.words())
+    static_tables = StaticTables(os.environ[STATIC_TABLES_ENV])
+    words_set = static_tables.words
+    KEYWORDS_AREA, KEYWORDS_PRICE, KEYWORDS_FOOD = static_tables.keywords()
 
+else:
+    import nltk
+    import pandas as pd
 
-file = pd.read_csv("data/raw_data/restaurant_info.csv")
+    nltk.download('words', quiet=True)
 
-KEYWORDS_AREA = file["area"].unique()
-KEYWORDS_AREA = [x for x in KEYWORDS_AREA if str(x) != 'nan']
+    from nltk.corpus import words
 
-KEYWORDS_PRICE = file["pricerange"].unique()
-KEYWORDS_FOOD = file["food"].unique()
+    words_set = set(words.words())
+
+    file = pd.read_csv("data/raw_data/restaurant_info.csv")
+
+    KEYWORDS_AREA = file["area"].unique()
+    KEYWORDS_AREA = [x for x in KEYWORDS_AREA if str(x) != 'nan']
+
+    KEYWORDS_PRICE = file["pricerange"].unique()
+    KEYWORDS_FOOD = file["food"].unique()
 
 KEYWORDS_POSTCODE = ["postcode", "post", "postal"]
 KEYWORDS_ADDRESS = ["address", "where", "location"]
@@ -119,10 +131,11 @@ def inform_keyword_finder(sentence: str, type=None, levenshtein_distance=LEVENSH
 
 
 def adjusted_levenshtein(keyword: str, word: str) -> int:
+    # Don't autocorrect words that start with different letters. Checked first as it's much cheaper than the lookup
+    # in words_set (a binary search when using shared tables).
+    if keyword[0] != word[0]:
+        return 10
     # Don't autocorrect valid English words to other words
     if word in words_set and word != keyword:
         return 10
-    # Don't autocorrect words that start with different letters
-    if keyword[0] != word[0]:
-        return 10
     return Levenshtein.distance(keyword, word)
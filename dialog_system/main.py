@@ -1,19 +1,24 @@
+import argparse
 import sys
 import os
 
 sys.path.append(os.getcwd())
 
-from classifiers.feedforward_nn import FeedForwardNN
-from classifiers.logistic_regression import LogisticRegressionModel
-from data.data_processor import train_data
-from dialog_system.dialog_manager import DialogManager
 from dialog_system.config import create_config_parser, Config
-from dialog_system.reasoning import handle_reasoning
+from dialog_system.profiler import StartupProfiler
 
 
 if __name__ == "__main__":
-    parser = create_config_parser()
-    args = parser.parse_args()
+    # Building the full parser imports the classifier registry, so --profile-startup is looked up on its own first and
+    # profiling starts before that.
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("--profile-startup", default=None)
+    profiler = StartupProfiler(enabled=bool(pre_parser.parse_known_args()[0].profile_startup))
+    profiler.start()
+
+    with profiler.phase("arguments and registry"):
+        parser = create_config_parser()
+        args = parser.parse_args()
 
     config = Config(
         caps_lock=args.capslock,
@@ -24,10 +29,70 @@ if __name__ == "__main__":
         informal=args.version0
     )
 
-    manager = DialogManager(LogisticRegressionModel(train_data), config)
-    # manager = DialogManager(FeedForwardNN(train_data, debug=config.debug_mode), config)
+    if args.workers:
+        if args.profile_startup:
+            parser.error("--profile-startup profiles the console's startup and can't be used with --workers")
+
+        # The server's front process stays light: data, keyword tables and classifiers are only loaded by the
+        # processes that need them, so nothing heavy is imported before this point.
+        from classifiers.registry import MODEL_SERVER_CLASSIFIERS
+        from dialog_system.server import serve
+
+        if args.classifier in MODEL_SERVER_CLASSIFIERS and not args.classifier_server:
+            parser.error(f"--workers with --classifier {args.classifier} requires --classifier-server "
+                         f"(run classifiers/model_server.py --classifier {args.classifier})")
+        if args.shadow_classifier in MODEL_SERVER_CLASSIFIERS:
+            # The shadow classifier is always built in each worker; there is no model server for it.
+            parser.error(f"--shadow-classifier {args.shadow_classifier} can't be used with --workers")
+
+        serve(config, args.classifier, args.workers, args.host, args.port, args.session_dir, args.static_dir,
+              args.classifier_server, args.shadow_classifier, args.shadow_log)
+        sys.exit()
+
+    with profiler.phase("classifier modules"):
+        from classifiers.baseline_rulebased import BaselineRuleBased
+        from classifiers.registry import load_classifier, import_report
+    with profiler.phase("data (load and split)"):
+        from data.data_processor import train_data, dev_data
+    with profiler.phase("dialog modules and keywords"):
+        from dialog_system.dialog_manager import DialogManager
+        from dialog_system.model_loader import BackgroundClassifierLoader
+        from dialog_system.reasoning import handle_reasoning
+
+    def build_classifier():
+        if args.classifier_server:
+            from classifiers.model_server import RemoteClassifier
+            return RemoteClassifier(args.classifier_server)
+
+        classifier = load_classifier(args.classifier, train_data, dev_data, debug=config.debug_mode)
+        if config.debug_mode:
+            print(import_report())
+        return classifier
+
+    # Answer with the rule baseline straight away while the configured model trains in the background.
+    with profiler.phase("dialog manager"):
+        manager = DialogManager(BaselineRuleBased([act for act, _ in train_data]), config)
+
+    if args.profile_startup:
+        # Build the classifier in the foreground, so its imports and allocations aren't mixed with other phases.
+        with profiler.phase(f"classifier ({args.classifier})"):
+            manager.act_classifier = build_classifier()
+        profiler.stop()
+        profiler.write_report(args.profile_startup)
+        print(f"Startup profile written to {args.profile_startup}")
+    else:
+        BackgroundClassifierLoader(manager, build_classifier).start()
+
+    if args.shadow_classifier:
+        from dialog_system.shadow import configure_logging
+        configure_logging(args.shadow_log)
+        BackgroundClassifierLoader(manager, lambda: load_classifier(args.shadow_classifier, train_data, dev_data),
+                                   shadow=True).start()
 
     suggestions = manager.converse()
 
+    if manager.shadow_evaluator and config.debug_mode:
+        print(manager.shadow_evaluator.report())
+
     if suggestions is not None:
         handle_reasoning(suggestions, config)
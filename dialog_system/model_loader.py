@@ -0,0 +1,32 @@
+import threading
+import traceback
+from typing import Callable
+
+
+class BackgroundClassifierLoader(threading.Thread):
+    def __init__(self, manager, build_classifier: Callable[[], object], shadow: bool = False):
+        # The manager keeps answering with its current (cheap) classifier until the configured one is built, after
+        # which it is swapped in with a single attribute assignment. With shadow=True the classifier is installed as
+        # the manager's shadow classifier instead.
+        super().__init__(name="shadow-loader" if shadow else "classifier-loader", daemon=True)
+        self.manager = manager
+        self.build_classifier = build_classifier
+        self.shadow = shadow
+        if not shadow:
+            self.manager.classifier_ready = False
+
+    def run(self) -> None:
+        try:
+            classifier = self.build_classifier()
+        except Exception:
+            print("Loading the shadow classifier failed, continuing without it." if self.shadow else
+                  "Loading the classifier failed, continuing with the fallback classifier.")
+            traceback.print_exc()
+            return
+
+        if self.shadow:
+            self.manager.set_shadow_classifier(classifier)
+            return
+
+        self.manager.act_classifier = classifier
+        self.manager.classifier_ready = True
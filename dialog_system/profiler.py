@@ -0,0 +1,116 @@
+import builtins
+import importlib
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List
+
+# Records wall time and traced Python allocations per startup phase and per imported module. tracemalloc only sees
+# allocations made through Python's allocator, so native memory (e.g. TensorFlow's) shows up in wall time only.
+
+MAX_IMPORT_DEPTH = 2  # Imports nested deeper than this are included in their parent's numbers only
+MIB = 1024 * 1024
+
+
+@dataclass
+class Measurement:
+    name: str
+    seconds: float
+    allocated: int  # Net traced bytes still allocated at the end
+    peak: int = 0  # Highest traced bytes above the starting point; phases only
+    depth: int = 0
+    order: int = 0
+
+
+class StartupProfiler:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.phases: List[Measurement] = []
+        self.imports: List[Measurement] = []
+        self._import_depth = 0
+        self._imports_started = 0
+        self._original_import = None
+        self._original_import_module = None
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+
+        tracemalloc.start()
+        self._original_import = builtins.__import__
+        self._original_import_module = importlib.import_module
+        builtins.__import__ = self._timed_import
+        importlib.import_module = self._timed_import_module
+
+    def stop(self) -> None:
+        if not self.enabled or self._original_import is None:
+            return
+
+        builtins.__import__ = self._original_import
+        importlib.import_module = self._original_import_module
+        self._original_import = None
+        tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        start_memory = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+; otherwise the peak is the highest since start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            memory, peak = tracemalloc.get_traced_memory()
+            self.phases.append(Measurement(name, seconds, memory - start_memory, peak - start_memory))
+
+    def _measure_import(self, name: str, do_import):
+        if name in sys.modules or self._import_depth > MAX_IMPORT_DEPTH:
+            return do_import()
+
+        depth = self._import_depth
+        order = self._imports_started
+        self._imports_started += 1
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        self._import_depth += 1
+        try:
+            return do_import()
+        finally:
+            self._import_depth -= 1
+            seconds = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+            self.imports.append(Measurement(name, seconds, memory - start_memory, depth=depth, order=order))
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level:  # Relative imports; not used in this project, so don't bother resolving the name
+            return self._original_import(name, globals, locals, fromlist, level)
+        return self._measure_import(name, lambda: self._original_import(name, globals, locals, fromlist, level))
+
+    def _timed_import_module(self, name, package=None):
+        return self._measure_import(name, lambda: self._original_import_module(name, package))
+
+    def report(self) -> str:
+        lines = ["Startup phases:", f"{'phase':<30} {'wall (s)':>10} {'alloc (MiB)':>12} {'peak (MiB)':>12}"]
+        for m in self.phases:
+            lines.append(f"{m.name:<30} {m.seconds:>10.3f} {m.allocated / MIB:>12.2f} {m.peak / MIB:>12.2f}")
+        lines.append(f"{'total':<30} {sum(m.seconds for m in self.phases):>10.3f} "
+                     f"{sum(m.allocated for m in self.phases) / MIB:>12.2f}")
+
+        lines += ["", "Module imports (inclusive of nested imports, in import order):",
+                  f"{'module':<50} {'wall (s)':>10} {'alloc (MiB)':>12}"]
+        for m in sorted(self.imports, key=lambda m: m.order):
+            name = "  " * m.depth + m.name
+            lines.append(f"{name:<50} {m.seconds:>10.3f} {m.allocated / MIB:>12.2f}")
+
+        return "\n".join(lines)
+
+    def write_report(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.report() + "\n")
@@ -0,0 +1,331 @@
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import threading
+import time
+import traceback
+import zlib
+
+from shared_static import STATIC_TABLES_ENV, STATIC_TABLES_PATH
+
+# The front process only routes lines of JSON to worker processes and keeps them healthy. Read-only data (catalog,
+# word list, fitted classifier) is built once by a short-lived process and memory-mapped by every worker (see
+# shared_static); sessions and the DialogManager itself are per worker.
+
+HOST = "127.0.0.1"
+PORT = 8028
+WORKER_START_TIMEOUT = 60  # seconds; workers answer with the rule baseline until their classifier is built
+REQUEST_TIMEOUT = 30
+HEALTH_CHECK_INTERVAL = 5
+HEALTH_CHECK_TIMEOUT = 5
+STOP_TIMEOUT = 10
+
+
+def session_path(session_dir: str, index: int) -> str:
+    return os.path.join(session_dir, f"sessions-{index}.sqlite3")
+
+
+def _build_static_tables(path: str, classifier_name: str = None) -> None:
+    # Without classifier_name only the catalog and word list, which is quick; workers can start on those.
+    from keyword_extractor import words_set
+    from shared_static import read_catalog_rows, write_static_tables
+
+    classifier = None
+    if classifier_name:
+        from classifiers.registry import load_classifier
+        from data.data_processor import train_data, dev_data
+        classifier = load_classifier(classifier_name, train_data, dev_data)
+
+    write_static_tables(path, read_catalog_rows(), words_set, classifier)
+
+
+def _worker_main(conn, index: int, config, classifier_name: str, session_dir: str,
+                 classifier_server: str = None, shadow_classifier_name: str = None, shadow_log: str = None) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The front process decides when workers stop
+
+    from dialog_system.dialog_manager import DialogManager
+    from session_store import SessionStore
+    from shared_static import StaticTables
+
+    static_tables = StaticTables(os.environ[STATIC_TABLES_ENV])
+    if classifier_server:
+        from classifiers.model_server import RemoteClassifier
+        classifier = RemoteClassifier(classifier_server)
+    else:
+        classifier = static_tables.classifier()
+
+    if classifier is None:
+        # Answer with the rule baseline until the classifier is built: by the front process for exportable classifiers
+        # (see DialogServer.build_classifier_tables), otherwise in the background here.
+        from classifiers.baseline_rulebased import BaselineRuleBased
+        from classifiers.registry import EXPORTABLE_CLASSIFIERS, load_classifier
+        from data.data_processor import train_data, dev_data
+        from model_loader import BackgroundClassifierLoader
+
+        manager = DialogManager(BaselineRuleBased([act for act, _ in train_data]), config, static_tables.catalog_rows())
+        if classifier_name in EXPORTABLE_CLASSIFIERS:
+            manager.classifier_ready = False
+        else:
+            BackgroundClassifierLoader(manager, lambda: load_classifier(classifier_name, train_data, dev_data)).start()
+    else:
+        manager = DialogManager(classifier, config, static_tables.catalog_rows())
+    sessions = SessionStore(manager.all_restaurants, config, path=session_path(session_dir, index))
+
+    if shadow_classifier_name:
+        # Trained in the background, so it doesn't hold up the worker becoming ready.
+        from classifiers.registry import load_classifier
+        from data.data_processor import train_data, dev_data
+        from model_loader import BackgroundClassifierLoader
+        from shadow import configure_logging
+        if shadow_log:
+            configure_logging(shadow_log)
+        BackgroundClassifierLoader(manager, lambda: load_classifier(shadow_classifier_name, train_data, dev_data),
+                                   shadow=True).start()
+
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        message, payload = conn.recv()
+
+        if message == "ping":
+            sessions.expire()  # Health checks come every few seconds, which is often enough
+            conn.send(("pong", len(sessions)))
+
+        elif message == "load_classifier":
+            classifier = StaticTables(os.environ[STATIC_TABLES_ENV]).classifier()
+            if classifier is not None:
+                manager.act_classifier = classifier
+                manager.classifier_ready = True
+            conn.send(("loaded", classifier is not None))
+
+        elif message == "stop":
+            sessions.close()  # Spills every session, so a restarted worker picks them up again
+            conn.send(("stopped", None))
+            return
+
+        elif message == "turn":
+            session_id, utterance = payload
+            try:
+                dialog_state = manager.respond(sessions, session_id, utterance)
+            except Exception as e:
+                traceback.print_exc()
+                conn.send(("reply", {"session": session_id, "error": str(e)}))
+                continue
+
+            system_message = dialog_state.system_message or ""
+            conn.send(("reply", {
+                "session": session_id,
+                "message": system_message.upper() if config.caps_lock else system_message,
+                "conversation_over": dialog_state.conversation_over,
+                "suggestions": [r.name for r in dialog_state.extra_requirements_suggestions],
+            }))
+            # No speculation here (unlike the console loop): a worker has one thread, so the next request, likely for
+            # another session, would wait behind it.
+
+
+class WorkerHandle:
+    def __init__(self, context, restart_context, index: int, config, classifier_name: str, session_dir: str,
+                 classifier_server: str = None, shadow_classifier_name: str = None, shadow_log: str = None):
+        # Replacements are started with restart_context: by then the front process runs handler, health-check and
+        # SIGHUP threads, and forking a multi-threaded process can leave the child with locks held by other threads.
+        self.context = context
+        self.restart_context = restart_context
+        self.index = index
+        self.args = (index, config, classifier_name, session_dir, classifier_server, shadow_classifier_name,
+                     shadow_log)
+        self.lock = threading.Lock()  # One request at a time per worker; requests and health checks share the pipe
+        self.process = None
+        self.conn = None
+        self.pid = None
+
+    def start(self, context=None) -> None:
+        context = context or self.context
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,) + self.args,
+                                            name=f"dialog-worker-{self.index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def wait_until_ready(self, timeout: float = WORKER_START_TIMEOUT) -> None:
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Worker {self.index} did not start within {timeout} seconds")
+        _, self.pid = self.conn.recv()
+
+    def request(self, message: str, payload=None, timeout: float = REQUEST_TIMEOUT):
+        with self.lock:
+            try:
+                return self._request(message, payload, timeout)
+            except TimeoutError:
+                self._restart()  # Its late reply would otherwise be read as the answer to the next request
+                raise
+
+    def _request(self, message: str, payload, timeout: float):
+        self.conn.send((message, payload))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Worker {self.index} did not answer within {timeout} seconds")
+        return self.conn.recv()[1]
+
+    def is_healthy(self) -> bool:
+        if not self.process.is_alive():
+            return False
+
+        if not self.lock.acquire(timeout=HEALTH_CHECK_TIMEOUT):
+            return True  # Busy with a turn, which isn't a reason to restart it
+        try:
+            self._request("ping", None, HEALTH_CHECK_TIMEOUT)
+            return True
+        except (TimeoutError, EOFError, OSError):
+            return False
+        finally:
+            self.lock.release()
+
+    def stop(self) -> None:
+        try:
+            if self.process.is_alive():
+                self._request("stop", None, STOP_TIMEOUT)
+        except (TimeoutError, EOFError, OSError):
+            pass
+
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+    def restart(self) -> None:
+        with self.lock:
+            self._restart()
+
+    def _restart(self) -> None:
+        self.stop()
+        self.start(self.restart_context)
+        self.wait_until_ready()
+
+
+class DialogServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, config, classifier_name: str, workers: int, host: str = HOST, port: int = PORT,
+                 session_dir: str = ".", static_path: str = STATIC_TABLES_PATH, classifier_server: str = None,
+                 shadow_classifier_name: str = None, shadow_log: str = None):
+        # With classifier_server, workers use a RemoteClassifier instead of holding the classifier themselves.
+        from classifiers.registry import EXPORTABLE_CLASSIFIERS, MODEL_SERVER_CLASSIFIERS
+        if not classifier_server and classifier_name in MODEL_SERVER_CLASSIFIERS:
+            raise ValueError(f"{classifier_name} can't be built in every worker; serve it with "
+                             f"classifiers/model_server.py and pass --classifier-server")
+        if shadow_classifier_name in MODEL_SERVER_CLASSIFIERS:
+            raise ValueError(f"{shadow_classifier_name} can't be built in every worker, so it can't be the shadow "
+                             f"classifier of a server")
+
+        super().__init__((host, port), DialogRequestHandler)
+
+        # Prefer fork: workers start faster and share whatever the front process already imported.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        restart_context = multiprocessing.get_context("forkserver") if "forkserver" in methods else context
+
+        # Build the shared tables in a separate process, so the front process doesn't hold nltk, sklearn or the
+        # training data. Workers (and their replacements) find the tables through the environment.
+        builder = context.Process(target=_build_static_tables, args=(static_path,), name="static-tables-builder")
+        builder.start()
+        builder.join()
+        if builder.exitcode != 0:
+            raise RuntimeError("Building the shared static tables failed")
+        os.environ[STATIC_TABLES_ENV] = os.path.abspath(static_path)
+
+        self.workers = [WorkerHandle(context, restart_context, i, config, classifier_name, session_dir,
+                                     classifier_server, shadow_classifier_name, shadow_log) for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+        for worker in self.workers:
+            worker.wait_until_ready()
+
+        self.stopping = threading.Event()
+        self.health_checker = threading.Thread(target=self.check_health, name="health-check", daemon=True)
+        self.health_checker.start()
+
+        if not classifier_server and classifier_name in EXPORTABLE_CLASSIFIERS:
+            threading.Thread(target=self.build_classifier_tables, args=(restart_context, static_path, classifier_name),
+                             name="classifier-builder", daemon=True).start()
+
+    def build_classifier_tables(self, context, static_path: str, classifier_name: str) -> None:
+        # Trains the classifier once, rewrites the shared tables with it and has every worker load it. Workers started
+        # after that load it from the tables themselves.
+        builder = context.Process(target=_build_static_tables, args=(static_path, classifier_name),
+                                  name="static-tables-builder")
+        builder.start()
+        builder.join()
+        if builder.exitcode != 0:
+            print(f"Building {classifier_name} failed, workers keep answering with the rule baseline.")
+            return
+
+        for worker in self.workers:
+            try:
+                worker.request("load_classifier")
+            except (TimeoutError, EOFError, OSError):
+                pass  # Restarted; it loads the classifier when it starts
+        print(f"Workers switched to {classifier_name}.")
+
+    def route(self, session_id: str) -> WorkerHandle:
+        # crc32 rather than hash(), which is salted per process; a session must always land on the same worker.
+        return self.workers[zlib.crc32(session_id.encode()) % len(self.workers)]
+
+    def check_health(self) -> None:
+        while not self.stopping.wait(HEALTH_CHECK_INTERVAL):
+            for worker in self.workers:
+                if not worker.is_healthy():
+                    print(f"Worker {worker.index} (pid {worker.pid}) is unhealthy, restarting it.")
+                    worker.restart()
+
+    def restart_workers(self) -> None:
+        # Rolling restart: only the sessions of the worker that's restarting wait.
+        for worker in self.workers:
+            worker.restart()
+
+    def server_close(self) -> None:
+        self.stopping.set()
+        super().server_close()
+        for worker in self.workers:
+            with worker.lock:
+                worker.stop()
+
+
+class DialogRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON object per line: {"session": "...", "utterance": "..."}. An empty utterance starts the session.
+    # "additional requirements" ends the session and replies with its suggestions; the console's follow-up reasoning
+    # dialog isn't available here.
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                session_id = str(request["session"])
+                reply = self.server.route(session_id).request("turn", (session_id, request.get("utterance", "")))
+            except (ValueError, KeyError, TypeError) as e:  # TypeError: valid JSON, but not an object
+                reply = {"error": f"Invalid request: {e}"}
+            except (TimeoutError, EOFError, OSError) as e:
+                reply = {"error": f"Worker unavailable: {e}"}
+
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+def serve(config, classifier_name: str, workers: int, host: str = HOST, port: int = PORT,
+          session_dir: str = ".", static_path: str = STATIC_TABLES_PATH, classifier_server: str = None,
+          shadow_classifier_name: str = None, shadow_log: str = None) -> None:
+    start = time.perf_counter()
+    server = DialogServer(config, classifier_name, workers, host, port, session_dir, static_path, classifier_server,
+                          shadow_classifier_name, shadow_log)
+    print(f"Serving on {host}:{port} with {workers} workers (started in {time.perf_counter() - start:.1f}s).")
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=server.restart_workers, daemon=True).start())
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from dialog_state import DialogState, Restaurant
+
+MAX_SESSIONS_IN_MEMORY = 1000
+SESSION_DB_PATH = "sessions.sqlite3"
+SESSION_MAX_AGE = 24 * 60 * 60  # seconds; sessions spilled this long ago are considered abandoned and deleted
+
+
+class SessionStore:
+    def __init__(self, restaurants: List[Restaurant], config=None, capacity: int = MAX_SESSIONS_IN_MEMORY,
+                 path: str = SESSION_DB_PATH, max_age: float = SESSION_MAX_AGE):
+        # The most recently used sessions are kept as DialogState objects. Once there are more than `capacity`, the
+        # least recently used ones are serialized to SQLite and restored when their next turn comes in.
+        self.restaurants = restaurants
+        self.config = config
+        self.capacity = capacity
+        self.max_age = max_age
+        self._sessions: "OrderedDict[str, DialogState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state BLOB, updated REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._db.commit()
+        self.expire()
+
+    def __len__(self) -> int:
+        # All sessions, in memory and spilled.
+        with self._lock:
+            spilled, = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            return len(self._sessions) + spilled
+
+    def expire(self) -> int:
+        # Deletes sessions spilled more than max_age ago, so without a turn for at least that long. In-memory sessions
+        # are the most recently used ones; abandoned ones get spilled eventually and expire from there. Returns the
+        # number deleted.
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE updated < ?",
+                                       (time.time() - self.max_age,)).rowcount
+            self._db.commit()
+            return deleted
+
+    def get(self, session_id: str) -> Optional[DialogState]:
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                return self._sessions[session_id]
+
+            row = self._db.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+
+            # The in-memory copy is authoritative from now on.
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+            dialog_state = DialogState.from_bytes(row[0], self.restaurants, self.config)
+            self._keep_in_memory(session_id, dialog_state)
+
+            return dialog_state
+
+    def put(self, session_id: str, dialog_state: DialogState) -> None:
+        # Cached suggestion lists and strings would stay attached to every stored session; they're cheap to recompute.
+        dialog_state.clear_speculation()
+        with self._lock:
+            self._keep_in_memory(session_id, dialog_state)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def flush(self) -> None:
+        # Spill every in-memory session, e.g. before shutting down.
+        with self._lock:
+            while self._sessions:
+                self._spill(*self._sessions.popitem(last=False))
+            self._db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+    def _keep_in_memory(self, session_id: str, dialog_state: DialogState) -> None:
+        self._sessions[session_id] = dialog_state
+        self._sessions.move_to_end(session_id)
+
+        if len(self._sessions) > self.capacity:
+            while len(self._sessions) > self.capacity:
+                self._spill(*self._sessions.popitem(last=False))
+            self._db.commit()
+
+    def _spill(self, session_id: str, dialog_state: DialogState) -> None:
+        self._db.execute("INSERT OR REPLACE INTO sessions (id, state, updated) VALUES (?, ?, ?)",
+                         (session_id, dialog_state.to_bytes(), time.time()))
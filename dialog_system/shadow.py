@@ -0,0 +1,82 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING = 1000  # Utterances waiting for the shadow classifier; more are dropped rather than queued
+LOG_EVERY = 100  # Log a summary after this many shadow predictions
+LOG_FORMAT = "%(asctime)s %(process)d %(name)s %(levelname)s %(message)s"
+
+
+def configure_logging(path: str) -> None:
+    # Called by every process running a shadow classifier: server workers don't inherit the front process' logging
+    # when they are started with forkserver.
+    logging.basicConfig(filename=path, level=logging.INFO, format=LOG_FORMAT)
+
+
+class ActStats:
+    def __init__(self):
+        self.count = 0
+        self.disagreements = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+class ShadowEvaluator(threading.Thread):
+    def __init__(self, classifier):
+        # Runs a candidate classifier next to the primary one on a background thread. The dialog only ever enqueues,
+        # so the shadow can't delay a response; when it falls behind, utterances are dropped and counted.
+        super().__init__(name="shadow-classifier", daemon=True)
+        self.classifier = classifier
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.stats: Dict[str, ActStats] = defaultdict(ActStats)  # Keyed by the primary classifier's act
+        self.dropped = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def submit(self, utterance: str, primary_act: str) -> None:
+        try:
+            self.pending.put_nowait((utterance, primary_act))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        while True:
+            utterance, primary_act = self.pending.get()
+
+            start = time.perf_counter()
+            try:
+                shadow_act = self.classifier.predict([utterance])[0]
+            except Exception:
+                logger.exception("Shadow classifier failed on %r", utterance)
+                self.errors += 1
+                continue
+            latency = time.perf_counter() - start
+
+            with self.lock:
+                stats = self.stats[primary_act]
+                stats.count += 1
+                stats.disagreements += shadow_act != primary_act
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+                total = sum(s.count for s in self.stats.values())
+
+            if shadow_act != primary_act:
+                logger.debug("Shadow disagreement on %r: primary %s, shadow %s", utterance, primary_act, shadow_act)
+            if total % LOG_EVERY == 0:
+                logger.info("%s", self.report())
+
+    def report(self) -> str:
+        with self.lock:
+            lines = [f"Shadow classifier {type(self.classifier).__name__} "
+                     f"({self.dropped} dropped, {self.errors} errors):"]
+            for act, stats in sorted(self.stats.items()):
+                lines.append(f"{act}: {stats.count} utterances, disagreement {stats.disagreements / stats.count:.2%}, "
+                             f"mean latency {stats.total_latency / stats.count * 1000:.2f} ms, "
+                             f"max latency {stats.max_latency * 1000:.2f} ms")
+
+        return "\n".join(lines)
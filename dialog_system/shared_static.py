@@ -0,0 +1,74 @@
+import csv
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from data.static_tables import PackedStrings, save_arrays, load_arrays, load_meta, with_prefix, strip_prefix
+
+# The read-only data every dialog worker needs (restaurant catalog, English word list, fitted classifier), written once
+# as flat memory-mapped arrays so that forked workers share it instead of each holding a copy.
+
+STATIC_TABLES_ENV = "DIALOG_STATIC_TABLES"
+STATIC_TABLES_PATH = "static_tables"
+
+CATALOG_PRICERANGE = 1
+CATALOG_AREA = 2
+CATALOG_FOOD = 5
+
+
+def read_catalog_rows(path: str = "data/raw_data/restaurant_info.csv") -> List[List[str]]:
+    with open(path, "r") as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        return list(reader)
+
+
+def write_static_tables(path: str, catalog_rows: List[List[str]], words: Iterable[str], classifier=None) -> None:
+    # The catalog is stored as codes (one row of value indices per restaurant) into a table of its distinct values, so
+    # each value is decoded only once.
+    values = PackedStrings.from_strings({field for row in catalog_rows for field in row}, sort=True)
+    arrays = {
+        **values.to_arrays("catalog_values"),
+        "catalog_codes": np.array([[values.index(field) for field in row] for row in catalog_rows], dtype=np.int32),
+        **PackedStrings.from_strings(words, sort=True).to_arrays("words"),
+    }
+    meta = {}
+
+    if hasattr(classifier, "to_arrays"):
+        classifier_arrays, meta["classifier"] = classifier.to_arrays()
+        arrays.update(with_prefix(classifier_arrays, "classifier_"))
+
+    save_arrays(path, arrays, meta)
+
+
+class StaticTables:
+    def __init__(self, path: str):
+        self.path = path
+        self.arrays = load_arrays(path)
+        self.meta = load_meta(path)
+        self.words = PackedStrings.from_arrays(self.arrays, "words")
+        self.catalog_values = PackedStrings.from_arrays(self.arrays, "catalog_values")
+        self.catalog_codes = self.arrays["catalog_codes"]
+
+    def catalog_rows(self) -> List[List[str]]:
+        # Rows share one str object per distinct value
+        values = list(self.catalog_values)
+        return [[values[code] for code in row] for row in self.catalog_codes.tolist()]
+
+    def catalog_column(self, column: int) -> List[str]:
+        # Distinct values of a column, in the order they first appear
+        codes = self.catalog_codes[:, column]
+        _, first = np.unique(codes, return_index=True)
+        return [self.catalog_values[code] for code in codes[np.sort(first)].tolist()]
+
+    def keywords(self) -> Tuple[List[str], List[str], List[str]]:
+        # Same values and order as reading the catalog with pandas and taking unique(), without empty areas.
+        area = [value for value in self.catalog_column(CATALOG_AREA) if value]
+        return area, self.catalog_column(CATALOG_PRICERANGE), self.catalog_column(CATALOG_FOOD)
+
+    def classifier(self) -> Optional[object]:
+        if "classifier" not in self.meta:
+            return None
+
+        from classifiers.registry import classifier_from_arrays
+        return classifier_from_arrays(strip_prefix(self.arrays, "classifier_"), self.meta["classifier"])